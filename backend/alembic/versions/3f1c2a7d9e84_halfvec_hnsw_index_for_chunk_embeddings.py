@@ -0,0 +1,44 @@
+"""halfvec HNSW index for chunk embeddings
+
+Revision ID: 3f1c2a7d9e84
+Revises: 04b9aac5e36e
+Create Date: 2026-10-18 10:12:41.207315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9e84'
+down_revision: Union[str, Sequence[str], None] = '04b9aac5e36e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.add_column('transcript_chunks', sa.Column('embedding_half', sa.Text(), nullable=True))
+        return
+    
+    # pgvector cannot index vector columns above 2000 dimensions, but HNSW
+    # supports halfvec up to 4000. The initial migration was generated against
+    # SQLite and left embedding as text, so convert it to a real vector first.
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    op.execute('ALTER TABLE transcript_chunks ALTER COLUMN embedding TYPE vector(3072) USING embedding::vector(3072)')
+    op.execute('ALTER TABLE transcript_chunks ADD COLUMN embedding_half halfvec(3072)')
+    op.execute('UPDATE transcript_chunks SET embedding_half = embedding::halfvec(3072) WHERE embedding IS NOT NULL')
+    op.execute(
+        'CREATE INDEX ix_transcript_chunks_embedding_half_hnsw ON transcript_chunks '
+        'USING hnsw (embedding_half halfvec_l2_ops) WITH (m = 16, ef_construction = 64)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_transcript_chunks_embedding_half_hnsw')
+    op.drop_column('transcript_chunks', 'embedding_half')
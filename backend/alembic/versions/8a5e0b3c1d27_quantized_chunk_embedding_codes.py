@@ -0,0 +1,30 @@
+"""quantized chunk embedding codes
+
+Revision ID: 8a5e0b3c1d27
+Revises: 3f1c2a7d9e84
+Create Date: 2026-10-18 11:02:09.518834
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a5e0b3c1d27'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a7d9e84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transcript_chunks', sa.Column('embedding_code', sa.LargeBinary(), nullable=True))
+    op.add_column('transcript_chunks', sa.Column('embedding_scale', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transcript_chunks', 'embedding_scale')
+    op.drop_column('transcript_chunks', 'embedding_code')
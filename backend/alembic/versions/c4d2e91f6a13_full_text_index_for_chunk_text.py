@@ -0,0 +1,63 @@
+"""full-text index for chunk text
+
+Revision ID: c4d2e91f6a13
+Revises: 8a5e0b3c1d27
+Create Date: 2026-10-18 13:21:47.640112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d2e91f6a13'
+down_revision: Union[str, Sequence[str], None] = '8a5e0b3c1d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # Generated column keeps the tsvector in step with text without triggers
+        op.execute(
+            "ALTER TABLE transcript_chunks ADD COLUMN text_search tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('english', text)) STORED"
+        )
+        op.execute('CREATE INDEX ix_transcript_chunks_text_search ON transcript_chunks USING gin (text_search)')
+        return
+    
+    # External-content FTS5 table: the index stores only tokens, text stays in transcript_chunks
+    op.execute(
+        "CREATE VIRTUAL TABLE transcript_chunks_fts USING fts5("
+        "text, content='transcript_chunks', content_rowid='id', tokenize='porter unicode61')"
+    )
+    op.execute(
+        "CREATE TRIGGER transcript_chunks_fts_ai AFTER INSERT ON transcript_chunks BEGIN "
+        "INSERT INTO transcript_chunks_fts(rowid, text) VALUES (new.id, new.text); END"
+    )
+    op.execute(
+        "CREATE TRIGGER transcript_chunks_fts_ad AFTER DELETE ON transcript_chunks BEGIN "
+        "INSERT INTO transcript_chunks_fts(transcript_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+    )
+    op.execute(
+        "CREATE TRIGGER transcript_chunks_fts_au AFTER UPDATE OF text ON transcript_chunks BEGIN "
+        "INSERT INTO transcript_chunks_fts(transcript_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "INSERT INTO transcript_chunks_fts(rowid, text) VALUES (new.id, new.text); END"
+    )
+    op.execute("INSERT INTO transcript_chunks_fts(transcript_chunks_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_transcript_chunks_text_search')
+        op.drop_column('transcript_chunks', 'text_search')
+        return
+    
+    op.execute('DROP TRIGGER IF EXISTS transcript_chunks_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS transcript_chunks_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS transcript_chunks_fts_ai')
+    op.execute('DROP TABLE IF EXISTS transcript_chunks_fts')
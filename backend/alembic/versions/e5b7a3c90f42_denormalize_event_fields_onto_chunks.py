@@ -0,0 +1,60 @@
+"""denormalize event fields onto chunks
+
+Revision ID: e5b7a3c90f42
+Revises: c4d2e91f6a13
+Create Date: 2026-10-18 14:05:33.918204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7a3c90f42'
+down_revision: Union[str, Sequence[str], None] = 'c4d2e91f6a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    
+    op.add_column('transcript_chunks', sa.Column('event_id', sa.Integer(), nullable=True))
+    op.add_column('transcript_chunks', sa.Column('ticker', sa.String(), nullable=True))
+    op.add_column('transcript_chunks', sa.Column('event_date', sa.DateTime(timezone=True), nullable=True))
+    if postgresql:
+        op.create_foreign_key(
+            'fk_transcript_chunks_event_id_events', 'transcript_chunks', 'events', ['event_id'], ['id']
+        )
+    
+    # Correlated subqueries work on both SQLite and Postgres
+    op.execute(
+        "UPDATE transcript_chunks SET "
+        "event_id = (SELECT t.event_id FROM transcripts t WHERE t.id = transcript_chunks.transcript_id), "
+        "ticker = (SELECT e.ticker FROM transcripts t JOIN events e ON e.id = t.event_id "
+        "WHERE t.id = transcript_chunks.transcript_id), "
+        "event_date = (SELECT e.event_date FROM transcripts t JOIN events e ON e.id = t.event_id "
+        "WHERE t.id = transcript_chunks.transcript_id)"
+    )
+    
+    op.create_index(op.f('ix_transcript_chunks_transcript_id'), 'transcript_chunks', ['transcript_id'])
+    op.create_index('ix_transcript_chunks_event_id_chunk_index', 'transcript_chunks', ['event_id', 'chunk_index'])
+    op.create_index(
+        'ix_transcript_chunks_ticker_event_date', 'transcript_chunks', ['ticker', 'event_date'],
+        postgresql_where=sa.text('embedding IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transcript_chunks_ticker_event_date', table_name='transcript_chunks')
+    op.drop_index('ix_transcript_chunks_event_id_chunk_index', table_name='transcript_chunks')
+    op.drop_index(op.f('ix_transcript_chunks_transcript_id'), table_name='transcript_chunks')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('fk_transcript_chunks_event_id_events', 'transcript_chunks', type_='foreignkey')
+    op.drop_column('transcript_chunks', 'event_date')
+    op.drop_column('transcript_chunks', 'ticker')
+    op.drop_column('transcript_chunks', 'event_id')
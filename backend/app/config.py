@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -7,11 +8,24 @@ class Settings(BaseSettings):
     supabase_anon_key: str = "placeholder-anon-key"
     supabase_service_role_key: str = "placeholder-service-role-key"
     database_url: str = "sqlite:///./reseek.db"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
     
     openai_api_key: str
     
     use_pgvector: bool = False
     pgvector_dim: int = 3072
+    vector_backend: str = "auto"
+    vector_index_ttl_seconds: int = 300
+    pgvector_ann_enabled: bool = True
+    pgvector_hnsw_ef_search: int = 100
+    pgvector_rerank_factor: int = 4
+    pgvector_iterative_scan: str = "relaxed_order"
+    # In-memory index only; codes are stored in addition to the full embedding
+    embedding_quantization: str = "none"
+    quantization_rerank_factor: int = 8
     
     finnhub_api_key: str = ""
     quartr_api_key: str = ""
@@ -20,6 +34,63 @@ class Settings(BaseSettings):
     environment: str = "development"
     
     poll_interval_seconds: int = 60
+    poll_jitter_seconds: int = 10
+    transcript_provider: str = "finnhub"
+    # "inline" polls inside the API process, "worker" leaves it to `python -m app.worker`
+    scheduler_mode: str = "inline"
+    
+    embedding_batch_size: int = 64
+    embedding_max_concurrency: int = 4
+    embedding_max_retries: int = 3
+    
+    # OpenAI rate limits per minute; chat is served before ingestion before backfill
+    openai_chat_rpm: int = 500
+    openai_chat_tpm: int = 200000
+    openai_embedding_rpm: int = 3000
+    openai_embedding_tpm: int = 1000000
+    openai_max_retries: int = 5
+    openai_backoff_base_seconds: float = 1.0
+    openai_backoff_max_seconds: float = 60.0
+    
+    # "hybrid" fuses full-text and vector ranks; "vector" or "lexical" use one ranker
+    retrieval_mode: str = "hybrid"
+    hybrid_candidate_factor: int = 4
+    rrf_k: int = 60
+    rag_context_max_tokens: int = 3000
+    chat_batch_max_questions: int = 20
+    chat_batch_max_concurrency: int = 4
+    # Maximal Marginal Relevance over mmr_candidates nearest chunks to drop near-duplicates
+    mmr_enabled: bool = False
+    mmr_lambda: float = 0.7
+    mmr_candidates: int = 50
+    
+    # "utterance" packs whole speaker turns; "window" is fixed token windows with overlap
+    chunking_mode: str = "utterance"
+    
+    # "map_reduce" extracts quotes from every transcript section in parallel; "single" from the first only
+    summary_mode: str = "map_reduce"
+    summary_section_max_tokens: int = 6000
+    summary_max_concurrency: int = 4
+    summary_max_quotes: int = 40
+    
+    # Directory of *.txt prompts; empty uses backend/prompts
+    prompts_dir: str = ""
+    
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "./.cache/embeddings.sqlite3"
+    embedding_cache_max_mb: int = 512
+    query_embedding_cache_size: int = 1024
+    query_embedding_cache_ttl_seconds: int = 3600
+    answer_cache_size: int = 2048
+    answer_cache_ttl_seconds: int = 86400
+    # How long a scope's corpus fingerprint is reused before re-querying; bounds how late other workers' rewrites are noticed
+    answer_fingerprint_ttl_seconds: float = 5
+    quote_locator_cache_size: int = 256
+    # "replay" is read-only and a miss raises, for offline tests
+    completion_cache_mode: Literal["off", "read_write", "replay"] = "off"
+    completion_cache_path: str = "./.cache/completions.sqlite3"
+    completion_cache_max_mb: int = 256
+    completion_cache_ttl_seconds: int = 604800
     
     class Config:
         env_file = ".env"
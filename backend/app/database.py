@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from fastapi import HTTPException
@@ -10,9 +11,23 @@ settings = get_settings()
 
 engine = None
 SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
+
+
+def async_database_url(db_url: str) -> str:
+    """Same database through its async driver: aiosqlite or psycopg (v3) async"""
+    if db_url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + db_url[len("sqlite:"):]
+    scheme, rest = db_url.split("://", 1)
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2", "postgresql+psycopg"):
+        return f"postgresql+psycopg://{rest}"
+    return db_url
+
+
+db_url = settings.database_url
 
 try:
-    db_url = settings.database_url
     logger.info(f"Connecting to database: {db_url[:30]}...")
     
     if db_url.startswith("sqlite"):
@@ -35,6 +50,39 @@ except Exception as e:
     logger.warning(f"Database connection not available: {e}")
     logger.warning("API will start but database operations will fail with 503 errors")
 
+# Separate from the sync engine so a missing async driver (aiosqlite or
+# psycopg) only disables the async routes, not scripts and sync sessions
+try:
+    if db_url.startswith("sqlite"):
+        async_engine = create_async_engine(
+            async_database_url(db_url),
+            echo=settings.environment == "development"
+        )
+    else:
+        # Concurrent requests each hold a pooled connection only while they
+        # await a query, so throughput scales with pool_size + max_overflow.
+        async_engine = create_async_engine(
+            async_database_url(db_url),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=True,
+            echo=settings.environment == "development",
+            connect_args={"connect_timeout": 5}
+        )
+    
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+    logger.info("Async database engine created successfully")
+except Exception as e:
+    logger.warning(f"Async database engine not available: {e}")
+    logger.warning("Async routes will fail with 503 errors until the async driver is installed")
+
 Base = declarative_base()
 
 
@@ -49,3 +97,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Request-scoped AsyncSession; queries await the driver instead of blocking the event loop"""
+    if AsyncSessionLocal is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database not available. Please configure database credentials in .env file."
+        )
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,7 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import auth, watchlist, events, chat, seed
 from app.config import get_settings
+from app.services import embedding_cache, completion_cache
+from app.services.embedding_service import query_embedding_cache
+from app.services.rag_service import answer_cache, fingerprint_cache
+from app.services.quote_locator import locator_cache
+from app.services.prompt_registry import prompt_registry, PromptError
+from app.services.openai_service import chat_limiter, embedding_limiter
+from app.services.single_flight import flight_stats
+from app.services.scheduler import start_scheduler, shutdown_scheduler
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -40,11 +49,46 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "embedding_cache": await asyncio.to_thread(embedding_cache.cache_stats),
+        "completion_cache": await asyncio.to_thread(completion_cache.cache_stats),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "answer_fingerprint_cache": fingerprint_cache.stats(),
+        "quote_locator_cache": locator_cache.stats(),
+        "openai_rate_limits": {
+            "chat": chat_limiter.stats(),
+            "embeddings": embedding_limiter.stats()
+        },
+        "single_flight": flight_stats()
+    }
+
+
+@app.get("/prompts")
+async def list_prompts():
+    return {"prompts": prompt_registry.list()}
+
+
+@app.post("/prompts/reload")
+async def reload_prompts():
+    """Re-read prompt files; cached answers for the old versions stop matching"""
+    try:
+        return {"prompts": prompt_registry.reload()}
+    except PromptError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("ReSeek API starting up...")
+    prompt_registry.load()
+    if settings.scheduler_mode == "inline":
+        start_scheduler()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("ReSeek API shutting down...")
+    shutdown_scheduler()
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, Boolean, ForeignKey, JSON, LargeBinary, Index, Enum as SQLEnum, select
+from sqlalchemy.event import listens_for
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.sql import func, text as sql_text
+from pgvector.sqlalchemy import Vector, HALFVEC
 from app.database import Base
 import enum
 
@@ -107,9 +108,20 @@ class Transcript(Base):
 
 class TranscriptChunk(Base):
     __tablename__ = "transcript_chunks"
+    __table_args__ = (
+        Index("ix_transcript_chunks_event_id_chunk_index", "event_id", "chunk_index"),
+        Index(
+            "ix_transcript_chunks_ticker_event_date", "ticker", "event_date",
+            postgresql_where=sql_text("embedding IS NOT NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True)
-    transcript_id = Column(Integer, ForeignKey("transcripts.id"), nullable=False)
+    transcript_id = Column(Integer, ForeignKey("transcripts.id"), nullable=False, index=True)
+    # Copied from the event so retrieval filters without joining transcripts and events
+    event_id = Column(Integer, ForeignKey("events.id"))
+    ticker = Column(String)
+    event_date = Column(DateTime(timezone=True))
     chunk_index = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
     start_time = Column(String)
@@ -117,12 +129,35 @@ class TranscriptChunk(Base):
     speaker = Column(String)
     token_count = Column(Integer)
     embedding = Column(Vector(3072))
+    embedding_half = Column(HALFVEC(3072))
+    embedding_code = Column(LargeBinary)
+    embedding_scale = Column(Float)
     meta_data = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     transcript = relationship("Transcript", back_populates="chunks")
 
 
+@listens_for(TranscriptChunk, "before_insert")
+def copy_event_fields(mapper, connection, chunk):
+    """Fill event_id, ticker and event_date from the transcript's event when a writer leaves them unset"""
+    if chunk.event_id is not None and chunk.ticker is not None and chunk.event_date is not None:
+        return
+    row = connection.execute(
+        select(Event.id, Event.ticker, Event.event_date)
+        .join(Transcript, Transcript.event_id == Event.id)
+        .where(Transcript.id == chunk.transcript_id)
+    ).first()
+    if row is None:
+        return
+    if chunk.event_id is None:
+        chunk.event_id = row.id
+    if chunk.ticker is None:
+        chunk.ticker = row.ticker
+    if chunk.event_date is None:
+        chunk.event_date = row.event_date
+
+
 class Summary(Base):
     __tablename__ = "summaries"
     
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import get_async_db
 from app.models.models import User, Profile
 import logging
 
@@ -22,21 +23,21 @@ class ProfileUpdate(BaseModel):
 
 
 @router.post("/users")
-async def create_or_get_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def create_or_get_user(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create or retrieve user (called after Supabase auth)
     """
-    user = db.query(User).filter(User.id == user_data.id).first()
+    user = await db.get(User, user_data.id)
     
     if not user:
         user = User(id=user_data.id, email=user_data.email)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         
         profile = Profile(user_id=user.id)
         db.add(profile)
-        db.commit()
+        await db.commit()
         
         logger.info(f"Created new user: {user.email}")
     
@@ -44,9 +45,9 @@ async def create_or_get_user(user_data: UserCreate, db: Session = Depends(get_db
 
 
 @router.get("/profile/{user_id}")
-async def get_profile(user_id: str, db: Session = Depends(get_db)):
+async def get_profile(user_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get user profile"""
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
+    profile = (await db.execute(select(Profile).where(Profile.user_id == user_id))).scalars().first()
     
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -64,10 +65,10 @@ async def get_profile(user_id: str, db: Session = Depends(get_db)):
 async def update_profile(
     user_id: str,
     profile_data: ProfileUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user profile"""
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
+    profile = (await db.execute(select(Profile).where(Profile.user_id == user_id))).scalars().first()
     
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -79,8 +80,8 @@ async def update_profile(
     if profile_data.timezone is not None:
         profile.timezone = profile_data.timezone
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     
     return {"message": "Profile updated", "profile": {
         "name": profile.name,
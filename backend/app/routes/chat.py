@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional
-from app.database import get_db
-from app.services.rag_service import query_rag, suggest_questions
+from app.config import get_settings
+from app.database import get_async_db
+from app import database
+from app.services.rag_service import query_rag, query_rag_batch, stream_query_rag, suggest_questions
+from app.services.rate_limiter import priority_lane, INTERACTIVE
 from app.models.models import ChatHistory
+import json
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 router = APIRouter()
 
@@ -17,6 +24,15 @@ class ChatQuery(BaseModel):
     event_id: Optional[int] = None
     tickers: Optional[List[str]] = None
     user_id: str
+    bypass_cache: bool = False
+
+
+class ChatBatchQuery(BaseModel):
+    questions: List[str]
+    event_id: Optional[int] = None
+    tickers: Optional[List[str]] = None
+    user_id: str
+    bypass_cache: bool = False
 
 
 class SuggestQuestionsRequest(BaseModel):
@@ -24,16 +40,18 @@ class SuggestQuestionsRequest(BaseModel):
 
 
 @router.post("/query")
-async def chat_query(query_data: ChatQuery, db: Session = Depends(get_db)):
+async def chat_query(query_data: ChatQuery, db: AsyncSession = Depends(get_async_db)):
     """
     RAG-based chat query with citations
     """
-    result = await query_rag(
-        question=query_data.question,
-        event_id=query_data.event_id,
-        ticker_list=query_data.tickers,
-        db=db
-    )
+    with priority_lane(INTERACTIVE):
+        result = await query_rag(
+            question=query_data.question,
+            event_id=query_data.event_id,
+            ticker_list=query_data.tickers,
+            db=db,
+            bypass_cache=query_data.bypass_cache
+        )
     
     chat_history = ChatHistory(
         user_id=query_data.user_id,
@@ -43,19 +61,112 @@ async def chat_query(query_data: ChatQuery, db: Session = Depends(get_db)):
         citations=result.get("citations", [])
     )
     db.add(chat_history)
-    db.commit()
+    await db.commit()
     
     return {
         "answer": result["answer"],
         "citations": result["citations"],
-        "sources": result.get("sources", [])
+        "sources": result.get("sources", []),
+        "cached": result.get("cached", False)
+    }
+
+
+@router.post("/query/stream")
+async def chat_query_stream(query_data: ChatQuery):
+    """
+    RAG chat query streamed as server-sent events: sources, token,
+    citation, then done (or error). The exchange is saved to chat history
+    once the answer is complete.
+    """
+    if database.AsyncSessionLocal is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Database not available. Please configure database credentials in .env file."
+        )
+    
+    async def event_stream():
+        # The stream outlives the request's dependencies, so it owns its session
+        async with database.AsyncSessionLocal() as db:
+            with priority_lane(INTERACTIVE):
+                async for event, data in stream_query_rag(
+                    question=query_data.question,
+                    event_id=query_data.event_id,
+                    ticker_list=query_data.tickers,
+                    db=db,
+                    bypass_cache=query_data.bypass_cache
+                ):
+                    yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                    
+                    if event == "done":
+                        db.add(ChatHistory(
+                            user_id=query_data.user_id,
+                            event_id=query_data.event_id,
+                            question=query_data.question,
+                            answer=data["answer"],
+                            citations=data["citations"]
+                        ))
+                        await db.commit()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/batch")
+async def chat_batch(query_data: ChatBatchQuery, db: AsyncSession = Depends(get_async_db)):
+    """
+    Answer several questions about the same event or tickers in one request,
+    sharing embedding, retrieval and summary lookups across them
+    """
+    if not query_data.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(query_data.questions) > settings.chat_batch_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.chat_batch_max_questions} questions per batch"
+        )
+    
+    with priority_lane(INTERACTIVE):
+        results = await query_rag_batch(
+            questions=query_data.questions,
+            event_id=query_data.event_id,
+            ticker_list=query_data.tickers,
+            db=db,
+            bypass_cache=query_data.bypass_cache
+        )
+    
+    db.add_all([
+        ChatHistory(
+            user_id=query_data.user_id,
+            event_id=query_data.event_id,
+            question=question,
+            answer=result["answer"],
+            citations=result.get("citations", [])
+        )
+        for question, result in zip(query_data.questions, results)
+    ])
+    await db.commit()
+    
+    return {
+        "results": [
+            {
+                "question": question,
+                "answer": result["answer"],
+                "citations": result["citations"],
+                "sources": result.get("sources", []),
+                "cached": result.get("cached", False)
+            }
+            for question, result in zip(query_data.questions, results)
+        ]
     }
 
 
 @router.post("/suggest-questions")
 async def get_suggested_questions(
     request: SuggestQuestionsRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get suggested questions for an event"""
     suggestions = await suggest_questions(request.event_id, db)
@@ -67,12 +178,15 @@ async def get_suggested_questions(
 async def get_chat_history(
     user_id: str,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's chat history"""
-    history = db.query(ChatHistory).filter(
-        ChatHistory.user_id == user_id
-    ).order_by(ChatHistory.created_at.desc()).limit(limit).all()
+    history = (await db.execute(
+        select(ChatHistory)
+        .where(ChatHistory.user_id == user_id)
+        .order_by(ChatHistory.created_at.desc())
+        .limit(limit)
+    )).scalars().all()
     
     return {
         "history": [
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
-from app.database import get_db
+from app.database import get_async_db
 from app.models.models import Event, Transcript, Summary, QAItem, EventStatus
 from app.services.embedding_service import process_transcript_chunks
 from app.services.summarization_service import generate_summary
 from app.services.qa_service import extract_qa_items
+from app.services.ingestion_service import run_ingestion_stages, pending_stages, INGESTION_STAGES
+from app.services.rate_limiter import BACKFILL
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,18 +24,18 @@ async def get_events(
     ticker: Optional[str] = None,
     status: Optional[str] = None,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get events with optional filtering"""
-    query = db.query(Event)
+    query = select(Event).options(selectinload(Event.transcript), selectinload(Event.summary))
     
     if ticker:
-        query = query.filter(Event.ticker == ticker)
+        query = query.where(Event.ticker == ticker)
     
     if status:
-        query = query.filter(Event.event_status == status)
+        query = query.where(Event.event_status == status)
     
-    events = query.order_by(Event.event_date.desc()).limit(limit).all()
+    events = (await db.execute(query.order_by(Event.event_date.desc()).limit(limit))).scalars().all()
     
     return {
         "events": [
@@ -56,13 +60,13 @@ async def get_events(
 async def get_upcoming_events(
     tickers: Optional[str] = None,
     days: int = 30,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get upcoming events"""
     from_date = datetime.now()
     to_date = from_date + timedelta(days=days)
     
-    query = db.query(Event).filter(
+    query = select(Event).where(
         Event.event_date >= from_date,
         Event.event_date <= to_date,
         Event.event_status == EventStatus.UPCOMING
@@ -70,9 +74,9 @@ async def get_upcoming_events(
     
     if tickers:
         ticker_list = [t.strip() for t in tickers.split(",")]
-        query = query.filter(Event.ticker.in_(ticker_list))
+        query = query.where(Event.ticker.in_(ticker_list))
     
-    events = query.order_by(Event.event_date).all()
+    events = (await db.execute(query.order_by(Event.event_date))).scalars().all()
     
     return {
         "upcoming_events": [
@@ -89,9 +93,12 @@ async def get_upcoming_events(
 
 
 @router.get("/{event_id}")
-async def get_event_detail(event_id: int, db: Session = Depends(get_db)):
+async def get_event_detail(event_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get event details with transcript and summary"""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = await db.get(
+        Event, event_id,
+        options=[selectinload(Event.transcript), selectinload(Event.summary), selectinload(Event.qa_items)]
+    )
     
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -105,7 +112,8 @@ async def get_event_detail(event_id: int, db: Session = Depends(get_db)):
         "event_date": event.event_date.isoformat(),
         "quarter": event.quarter,
         "fiscal_year": event.fiscal_year,
-        "audio_url": event.audio_url
+        "audio_url": event.audio_url,
+        "ingestion": (event.meta_data or {}).get("ingestion")
     }
     
     if event.transcript:
@@ -125,7 +133,7 @@ async def get_event_detail(event_id: int, db: Session = Depends(get_db)):
             "generated_at": event.summary.generated_at.isoformat()
         }
     
-    qa_items = db.query(QAItem).filter(QAItem.event_id == event_id).all()
+    qa_items = event.qa_items
     if qa_items:
         response["qa_items"] = [
             {
@@ -146,9 +154,12 @@ async def get_event_detail(event_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{event_id}/transcript")
-async def get_transcript(event_id: int, db: Session = Depends(get_db)):
+async def get_transcript(event_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get full transcript with chunks"""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = await db.get(
+        Event, event_id,
+        options=[selectinload(Event.transcript).selectinload(Transcript.chunks)]
+    )
     
     if not event or not event.transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
@@ -172,3 +183,28 @@ async def get_transcript(event_id: int, db: Session = Depends(get_db)):
             for chunk in transcript.chunks
         ]
     }
+
+
+@router.post("/{event_id}/ingest")
+async def retry_ingestion(
+    event_id: int,
+    background_tasks: BackgroundTasks,
+    stages: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Re-run ingestion stages (default: those not completed) in the background"""
+    event = await db.get(Event, event_id, options=[selectinload(Event.transcript)])
+    
+    if not event or not event.transcript:
+        raise HTTPException(status_code=404, detail="Transcript not found")
+    
+    stage_list = [s.strip() for s in stages.split(",")] if stages else pending_stages(event)
+    invalid = [stage for stage in stage_list if stage not in INGESTION_STAGES]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown stages: {', '.join(invalid)}")
+    
+    if stage_list:
+        # Re-runs yield to new transcripts and to chat in the OpenAI rate limiter
+        background_tasks.add_task(run_ingestion_stages, event_id, stage_list, BACKFILL)
+    
+    return {"event_id": event_id, "stages": stage_list}
@@ -1,23 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.models import Event, Transcript, Summary, QAItem, EventStatus
+from app.services.vector_index import get_vector_backend
+from app.services.rag_service import invalidate_answers
+from app.services.transcript_parser import parse_transcript
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
 @router.post("/seed")
-async def seed_mock_data(db: Session = Depends(get_db)):
+async def seed_mock_data(db: AsyncSession = Depends(get_async_db)):
     """Seed database with mock data for AAPL, MSFT, GOOGL, AMZN"""
     
     try:
         # Clear existing data for these companies
         tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN']
         for ticker in tickers:
-            events = db.query(Event).filter(Event.ticker == ticker).all()
+            events = (await db.execute(select(Event).where(Event.ticker == ticker))).scalars().all()
             for event in events:
-                db.delete(event)
-        db.commit()
+                get_vector_backend().invalidate_event(event.id)
+                await db.delete(event)
+        await db.commit()
         
         # Mock data for 4 companies
         companies = [
@@ -250,12 +255,13 @@ For Q4, we expect net sales between $160 billion and $167 billion, representing
                 fiscal_year=company['fiscal_year']
             )
             db.add(event)
-            db.flush()
+            await db.flush()
             
             # Create Transcript
             transcript = Transcript(
                 event_id=event.id,
-                raw_text=company['transcript']
+                raw_text=company['transcript'],
+                structured_data=parse_transcript(company['transcript'])
             )
             db.add(transcript)
             
@@ -291,7 +297,8 @@ For Q4, we expect net sales between $160 billion and $167 billion, representing
                 'qa_count': len(company['qa_items'])
             })
         
-        db.commit()
+        await db.commit()
+        invalidate_answers()
         
         return {
             "status": "success",
@@ -300,5 +307,5 @@ For Q4, we expect net sales between $160 billion and $167 billion, representing
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating mock data: {str(e)}")
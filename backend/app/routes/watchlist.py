@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List
-from app.database import get_db
+from app.database import get_async_db
 from app.models.models import Watchlist, WatchlistItem
 from app.data.nasdaq100 import NASDAQ_100
 import logging
@@ -18,17 +19,19 @@ class WatchlistItemCreate(BaseModel):
 
 
 @router.get("/{user_id}")
-async def get_user_watchlist(user_id: str, db: Session = Depends(get_db)):
+async def get_user_watchlist(user_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get user's watchlist"""
-    watchlist = db.query(Watchlist).filter(Watchlist.user_id == user_id).first()
+    watchlist = (await db.execute(select(Watchlist).where(Watchlist.user_id == user_id))).scalars().first()
     
     if not watchlist:
         watchlist = Watchlist(user_id=user_id, name="My Watchlist")
         db.add(watchlist)
-        db.commit()
-        db.refresh(watchlist)
+        await db.commit()
+        await db.refresh(watchlist)
     
-    items = db.query(WatchlistItem).filter(WatchlistItem.watchlist_id == watchlist.id).all()
+    items = (await db.execute(
+        select(WatchlistItem).where(WatchlistItem.watchlist_id == watchlist.id)
+    )).scalars().all()
     
     return {
         "watchlist_id": watchlist.id,
@@ -49,21 +52,23 @@ async def get_user_watchlist(user_id: str, db: Session = Depends(get_db)):
 async def add_to_watchlist(
     user_id: str,
     item_data: WatchlistItemCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add ticker to watchlist"""
-    watchlist = db.query(Watchlist).filter(Watchlist.user_id == user_id).first()
+    watchlist = (await db.execute(select(Watchlist).where(Watchlist.user_id == user_id))).scalars().first()
     
     if not watchlist:
         watchlist = Watchlist(user_id=user_id, name="My Watchlist")
         db.add(watchlist)
-        db.commit()
-        db.refresh(watchlist)
+        await db.commit()
+        await db.refresh(watchlist)
     
-    existing = db.query(WatchlistItem).filter(
-        WatchlistItem.watchlist_id == watchlist.id,
-        WatchlistItem.ticker == item_data.ticker
-    ).first()
+    existing = (await db.execute(
+        select(WatchlistItem).where(
+            WatchlistItem.watchlist_id == watchlist.id,
+            WatchlistItem.ticker == item_data.ticker
+        )
+    )).scalars().first()
     
     if existing:
         raise HTTPException(status_code=400, detail="Ticker already in watchlist")
@@ -75,8 +80,8 @@ async def add_to_watchlist(
     )
     
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    await db.refresh(item)
     
     logger.info(f"Added {item_data.ticker} to watchlist for user {user_id}")
     
@@ -88,15 +93,15 @@ async def add_to_watchlist(
 
 
 @router.delete("/items/{item_id}")
-async def remove_from_watchlist(item_id: int, db: Session = Depends(get_db)):
+async def remove_from_watchlist(item_id: int, db: AsyncSession = Depends(get_async_db)):
     """Remove ticker from watchlist"""
-    item = db.query(WatchlistItem).filter(WatchlistItem.id == item_id).first()
+    item = await db.get(WatchlistItem, item_id)
     
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    db.delete(item)
-    db.commit()
+    await db.delete(item)
+    await db.commit()
     
     return {"message": "Item removed from watchlist"}
 
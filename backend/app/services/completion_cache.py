@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Optional
+from app.config import get_settings
+from app.services.disk_cache import DiskCache
+import asyncio
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_cache: Optional[DiskCache] = None
+hits = 0
+misses = 0
+
+
+class CompletionCacheMiss(Exception):
+    """Replay mode found no cached completion for a request"""
+    pass
+
+
+def _get_cache() -> Optional[DiskCache]:
+    global _cache
+    if settings.completion_cache_mode == "off":
+        return None
+    if _cache is None:
+        _cache = DiskCache(
+            settings.completion_cache_path,
+            max_bytes=settings.completion_cache_max_mb * 1024 * 1024,
+            ttl_seconds=settings.completion_cache_ttl_seconds
+        )
+    return _cache
+
+
+def make_key(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    prompt_version: Optional[str] = None
+) -> str:
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "prompt_version": prompt_version
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return f"{model}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+async def get_cached(key: str) -> Optional[str]:
+    """
+    Cached completion text for key, or None on a miss.
+    In replay mode a miss raises CompletionCacheMiss.
+    """
+    global hits, misses
+    cache = _get_cache()
+    if cache is None:
+        return None
+    
+    try:
+        value = await asyncio.to_thread(cache.get, key)
+    except Exception as e:
+        logger.warning(f"Completion cache lookup failed: {e}")
+        value = None
+    
+    if value is None:
+        misses += 1
+        if settings.completion_cache_mode == "replay":
+            raise CompletionCacheMiss(f"No cached completion for {key}")
+        return None
+    hits += 1
+    return value.decode("utf-8")
+
+
+async def store(key: str, completion: Optional[str]):
+    """Store a completion; replay mode never writes"""
+    cache = _get_cache()
+    if cache is None or settings.completion_cache_mode == "replay" or completion is None:
+        return
+    try:
+        await asyncio.to_thread(cache.set, key, completion.encode("utf-8"))
+    except Exception as e:
+        logger.warning(f"Completion cache write failed: {e}")
+
+
+def cache_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"mode": settings.completion_cache_mode, "hits": hits, "misses": misses}
+    lookups = hits + misses
+    stats["hit_rate"] = hits / lookups if lookups else 0.0
+    cache = _get_cache()
+    if cache is not None:
+        stats.update(cache.stats())
+    return stats
@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, Optional, Sequence
+from app.services.openai_service import get_encoding
+from app.services.transcript_parser import UTTERANCE_HEADER
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Below this many tokens a truncated excerpt is not worth including
+MIN_EXCERPT_TOKENS = 32
+
+
+def merge_hits(hits: Sequence[Any]) -> List[Dict[str, Any]]:
+    """
+    Merge retrieved chunks of the same event whose character spans overlap
+    or whose chunk_index is consecutive into single excerpts, dropping the
+    repeated text of overlapping windows. Each excerpt keeps the best
+    (lowest) retrieval rank of its chunks. Chunks without stored offsets are
+    kept as they are.
+    """
+    excerpts = []
+    by_event: Dict[Any, List[Dict[str, Any]]] = {}
+    for rank, hit in enumerate(hits):
+        meta = hit.meta_data or {}
+        piece = {
+            "event_id": hit.event_id,
+            "chunk_ids": [hit.id],
+            "first_index": hit.chunk_index,
+            "last_index": hit.chunk_index,
+            "start": meta.get("start_char"),
+            "end": meta.get("end_char"),
+            "text": hit.text,
+            "speaker": hit.speaker,
+            "start_time": hit.start_time,
+            "rank": rank
+        }
+        if piece["start"] is None or piece["end"] is None:
+            excerpts.append(piece)
+        elif not any(hit.id in other["chunk_ids"] for other in by_event.get(hit.event_id, [])):
+            by_event.setdefault(hit.event_id, []).append(piece)
+    
+    for pieces in by_event.values():
+        pieces.sort(key=lambda piece: piece["start"])
+        current = pieces[0]
+        for piece in pieces[1:]:
+            if piece["start"] < current["end"]:
+                # Overlapping window: keep only the part past what we already have
+                if piece["end"] > current["end"]:
+                    current["text"] += piece["text"][current["end"] - piece["start"]:]
+                    current["end"] = piece["end"]
+            elif piece["first_index"] == current["last_index"] + 1:
+                current["text"] += "\n" + piece["text"]
+                current["end"] = piece["end"]
+            else:
+                excerpts.append(current)
+                current = piece
+                continue
+            current["chunk_ids"].extend(piece["chunk_ids"])
+            current["last_index"] = max(current["last_index"], piece["last_index"])
+            current["rank"] = min(current["rank"], piece["rank"])
+        excerpts.append(current)
+    
+    return sorted(excerpts, key=lambda excerpt: excerpt["rank"])
+
+
+def format_excerpt(excerpt: Dict[str, Any]) -> str:
+    text = excerpt["text"].strip()
+    if UTTERANCE_HEADER.match(text):
+        # Utterance-aligned chunks already open with "[ts] Speaker:"
+        return text
+    timestamp = excerpt["start_time"] or "unknown"
+    speaker = excerpt["speaker"] or "Speaker"
+    return f"[{timestamp}] {speaker}: {text}"
+
+
+def pack_context(hits: Sequence[Any], summary: Optional[Any], max_tokens: int) -> str:
+    """
+    Build LLM context within max_tokens: the summary bullets first, then
+    merged transcript excerpts in relevance order. The last excerpt that
+    does not fit whole is truncated at a token boundary.
+    """
+    encoding = get_encoding()
+    parts = []
+    budget = max_tokens
+    
+    if summary and summary.quicktake:
+        section = "\n".join(["=== SUMMARY ==="] + [f"- {item.get('bullet', '')}" for item in summary.quicktake]) + "\n"
+        tokens = len(encoding.encode(section))
+        if tokens <= budget:
+            parts.append(section)
+            budget -= tokens
+    
+    header = "=== RELEVANT TRANSCRIPT EXCERPTS ==="
+    parts.append(header)
+    budget -= len(encoding.encode(header)) + 1
+    
+    for excerpt in merge_hits(hits):
+        block = format_excerpt(excerpt) + "\n"
+        tokens = encoding.encode(block)
+        if len(tokens) + 1 <= budget:
+            parts.append(block)
+            budget -= len(tokens) + 1
+            continue
+        if budget - 1 >= MIN_EXCERPT_TOKENS:
+            parts.append(encoding.decode(tokens[:budget - 4]).rstrip() + " ...\n")
+        break
+    
+    context = "\n".join(parts)
+    logger.debug(f"Packed {len(hits)} chunks into {max_tokens - budget} context tokens")
+    return context
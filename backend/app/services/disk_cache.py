@@ -0,0 +1,114 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    Small key/value store in a local SQLite file.
+    Entries are evicted least-recently-used first once the stored values
+    exceed max_bytes, and with ttl_seconds set they expire that long after
+    being written. Calls block on SQLite I/O, so async callers run them
+    in a worker thread with asyncio.to_thread.
+    """
+    
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at)")
+        # Files written before entries could expire lack created_at; their rows count as written now
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if "created_at" not in columns:
+            self._conn.execute("ALTER TABLE entries ADD COLUMN created_at REAL")
+            self._conn.execute("UPDATE entries SET created_at = ?", (time.time(),))
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+    
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        
+        found = {}
+        now = time.time()
+        with self._lock:
+            # SQLite caps the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value, created_at FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self.ttl_seconds is not None and created_at is not None and now - created_at > self.ttl_seconds:
+                        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                        self.expirations += 1
+                    else:
+                        found[key] = value
+            
+            if found:
+                self._conn.executemany(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+        return found
+    
+    def set(self, key: str, value: bytes):
+        self.set_many([(key, value)])
+    
+    def set_many(self, items: Iterable[Tuple[str, bytes]]):
+        now = time.time()
+        rows = [(key, value, len(value), now, now) for key, value in items]
+        if not rows:
+            return
+        
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+    
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        # Trim to 90% so we don't evict on every subsequent write
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        
+        self.evictions += removed
+        logger.info(f"Evicted {removed} entries from {self.path}")
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {"entries": entries, "bytes": total, "evictions": self.evictions, "expirations": self.expirations}
@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Optional
+from array import array
+from app.config import get_settings
+from app.services.disk_cache import DiskCache
+import asyncio
+import hashlib
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_cache: Optional[DiskCache] = None
+hits = 0
+misses = 0
+
+
+def _get_cache() -> Optional[DiskCache]:
+    global _cache
+    if not settings.embedding_cache_enabled:
+        return None
+    if _cache is None:
+        _cache = DiskCache(
+            settings.embedding_cache_path,
+            max_bytes=settings.embedding_cache_max_mb * 1024 * 1024
+        )
+    return _cache
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different inputs share a key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(text: str, model: str, dimensions: Optional[int] = None) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions or 'native'}:{digest}"
+
+
+async def get_cached(texts: List[str], model: str, dimensions: Optional[int] = None) -> List[Optional[List[float]]]:
+    """Look up embeddings for texts, None for every text not in the cache"""
+    global hits, misses
+    cache = _get_cache()
+    if cache is None:
+        return [None] * len(texts)
+    
+    keys = [make_key(text, model, dimensions) for text in texts]
+    try:
+        found = await asyncio.to_thread(cache.get_many, list(set(keys)))
+    except Exception as e:
+        logger.warning(f"Embedding cache lookup failed: {e}")
+        found = {}
+    
+    results = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            misses += 1
+            results.append(None)
+        else:
+            hits += 1
+            results.append(array("f", value).tolist())
+    return results
+
+
+async def store(texts: List[str], embeddings: List[Optional[List[float]]], model: str, dimensions: Optional[int] = None):
+    """Store embeddings for texts, skipping inputs that failed to embed"""
+    cache = _get_cache()
+    if cache is None:
+        return
+    
+    items = [
+        (make_key(text, model, dimensions), array("f", embedding).tobytes())
+        for text, embedding in zip(texts, embeddings)
+        if embedding is not None
+    ]
+    try:
+        await asyncio.to_thread(cache.set_many, items)
+    except Exception as e:
+        logger.warning(f"Embedding cache write failed: {e}")
+
+
+def cache_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"enabled": settings.embedding_cache_enabled, "hits": hits, "misses": misses}
+    lookups = hits + misses
+    stats["hit_rate"] = hits / lookups if lookups else 0.0
+    cache = _get_cache()
+    if cache is not None:
+        stats.update(cache.stats())
+    return stats
@@ -1,118 +1,301 @@
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
-from app.models.models import Transcript, TranscriptChunk
-from app.services.openai_service import get_embedding, chunk_text
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Event, Transcript, TranscriptChunk
+from app.config import get_settings
+from app.services.openai_service import get_embedding, get_embeddings_batch, chunk_text, chunk_utterances
+from app.services.vector_index import ChunkHit, PgvectorBackend, get_vector_backend, fetch_hits, fetch_embeddings
+from app.services.quantization import encode
+from app.services.transcript_parser import ensure_structured, utterance_at, speaker_label
+from app.services.embedding_cache import normalize_text
+from app.services.cache import TTLCache
+from app.services.lexical_service import search_lexical, is_exact_lookup, reciprocal_rank_fusion
+from app.services.mmr import maximal_marginal_relevance
+import numpy as np
+import asyncio
 import logging
-import re
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
+query_embedding_cache = TTLCache(
+    max_entries=settings.query_embedding_cache_size,
+    ttl_seconds=settings.query_embedding_cache_ttl_seconds
+)
 
-async def process_transcript_chunks(transcript_id: int, transcript_text: str, db: Session):
+
+async def process_transcript_chunks(
+    transcript_id: int,
+    transcript_text: str,
+    db: AsyncSession,
+    structured: Optional[Dict[str, Any]] = None
+):
     """
-    Chunk transcript and generate embeddings for each chunk.
-    Attempts to preserve speaker and timestamp information.
+    Chunk transcript and generate embeddings for all chunks in batched requests.
+    Speaker and timestamp come from the utterance each chunk starts in.
     """
-    chunks_data = chunk_text(transcript_text, max_tokens=500, overlap=50)
+    event = (await db.execute(
+        select(Event.id, Event.ticker, Event.event_date)
+        .join(Transcript, Transcript.event_id == Event.id)
+        .where(Transcript.id == transcript_id)
+    )).one()
+    
+    structured = ensure_structured(transcript_text, structured)
+    if settings.chunking_mode == "utterance" and structured["utterances"]:
+        chunks_data = chunk_utterances(transcript_text, structured, max_tokens=500)
+    else:
+        chunks_data = chunk_text(transcript_text, max_tokens=500, overlap=50)
+    
+    embeddings = await get_embeddings_batch([chunk_info["text"] for chunk_info in chunks_data])
     
-    for chunk_info in chunks_data:
-        chunk_text_content = chunk_info["text"]
+    # Only the pgvector HNSW index reads the halfvec copy, and only the
+    # in-memory index reads quantized codes
+    store_half = isinstance(get_vector_backend(), PgvectorBackend)
+    quantization = "none" if store_half else settings.embedding_quantization
+    stored = []
+    for chunk_info, embedding in zip(chunks_data, embeddings):
+        if embedding is None:
+            logger.error(f"Skipping chunk {chunk_info['chunk_index']}: no embedding")
+            continue
         
-        speaker, timestamp = extract_metadata(chunk_text_content)
+        leading_space = len(chunk_info["text"]) - len(chunk_info["text"].lstrip())
+        utterance = utterance_at(structured, chunk_info["start_char"] + leading_space)
+        embedding_code, embedding_scale = encode(embedding, quantization)
         
-        try:
-            embedding = await get_embedding(chunk_text_content)
-            
-            chunk = TranscriptChunk(
-                transcript_id=transcript_id,
-                chunk_index=chunk_info["chunk_index"],
-                text=chunk_text_content,
-                start_time=timestamp,
-                speaker=speaker,
-                token_count=chunk_info["token_count"],
-                embedding=embedding,
-                meta_data={
-                    "start_token": chunk_info["start_token"],
-                    "end_token": chunk_info["end_token"]
-                }
-            )
-            
-            db.add(chunk)
-        except Exception as e:
-            logger.error(f"Error processing chunk {chunk_info['chunk_index']}: {e}")
-            continue
-    
-    db.commit()
-    logger.info(f"Processed {len(chunks_data)} chunks for transcript {transcript_id}")
-
-
-def extract_metadata(text: str) -> tuple:
-    """Extract speaker and timestamp from transcript chunk"""
-    speaker = None
-    timestamp = None
+        chunk = TranscriptChunk(
+            transcript_id=transcript_id,
+            event_id=event.id,
+            ticker=event.ticker,
+            event_date=event.event_date,
+            chunk_index=chunk_info["chunk_index"],
+            text=chunk_info["text"],
+            start_time=utterance["timestamp"] if utterance else None,
+            speaker=speaker_label(utterance) if utterance else None,
+            token_count=chunk_info["token_count"],
+            embedding=embedding,
+            embedding_half=embedding if store_half else None,
+            embedding_code=embedding_code,
+            embedding_scale=embedding_scale,
+            meta_data={
+                "start_token": chunk_info["start_token"],
+                "end_token": chunk_info["end_token"],
+                "start_char": chunk_info["start_char"],
+                "end_char": chunk_info["end_char"]
+            }
+        )
+        
+        db.add(chunk)
+        stored.append((chunk, embedding))
     
-    timestamp_pattern = r'\[(\d{2}:\d{2}:\d{2})\]'
-    timestamp_match = re.search(timestamp_pattern, text)
-    if timestamp_match:
-        timestamp = timestamp_match.group(1)
+    await db.commit()
     
-    speaker_pattern = r'\[?\d{2}:\d{2}:\d{2}\]?\s*([A-Za-z\s]+(?:,\s*[A-Za-z\s]+)?):' 
-    speaker_match = re.search(speaker_pattern, text)
-    if speaker_match:
-        speaker = speaker_match.group(1).strip()
+    get_vector_backend().add_chunks(
+        event.id,
+        [chunk.id for chunk, _ in stored],
+        [embedding for _, embedding in stored]
+    )
     
-    return speaker, timestamp
+    logger.info(f"Processed {len(stored)}/{len(chunks_data)} chunks for transcript {transcript_id}")
+
+
+async def get_query_embedding(query: str, model: str = "text-embedding-3-large") -> List[float]:
+    """
+    Embedding for a chat question. Users repeat the same handful of questions,
+    so embeddings are kept in process keyed by model and case-folded,
+    whitespace-normalized text.
+    """
+    key = (model, normalize_text(query).casefold())
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await get_embedding(query, model)
+        query_embedding_cache.set(key, embedding)
+    return embedding
+
+
+async def get_query_embeddings(queries: List[str], model: str = "text-embedding-3-large") -> List[Optional[List[float]]]:
+    """
+    get_query_embedding for several questions; the cache misses go out
+    in one batched request. None where embedding failed.
+    """
+    keys = [(model, normalize_text(query).casefold()) for query in queries]
+    embeddings = [query_embedding_cache.get(key) for key in keys]
+    misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if misses:
+        fresh = await get_embeddings_batch([queries[i] for i in misses], model)
+        for i, embedding in zip(misses, fresh):
+            if embedding is not None:
+                embeddings[i] = embedding
+                query_embedding_cache.set(keys[i], embedding)
+    return embeddings
 
 
 async def search_similar_chunks(
     query: str,
     event_id: int,
-    db: Session,
+    db: AsyncSession,
     limit: int = 5
-) -> List[TranscriptChunk]:
+) -> List[ChunkHit]:
     """
-    Search for similar transcript chunks using vector similarity.
+    Search for transcript chunks relevant to query within one event.
     """
-    query_embedding = await get_embedding(query)
-    
-    from sqlalchemy import select, func
-    from app.models.models import Event
-    
-    stmt = (
-        select(TranscriptChunk)
-        .join(Transcript)
-        .join(Event)
-        .where(Event.id == event_id)
-        .order_by(TranscriptChunk.embedding.l2_distance(query_embedding))
-        .limit(limit)
+    backend = get_vector_backend()
+    return await retrieve_chunks(
+        query, db, [event_id], limit,
+        lambda embedding, fetch: backend.search_event(embedding, event_id, db, fetch)
     )
-    
-    result = db.execute(stmt)
-    return result.scalars().all()
 
 
 async def search_similar_chunks_across_watchlist(
     query: str,
     ticker_list: List[str],
-    db: Session,
+    db: AsyncSession,
     limit: int = 10
-) -> List[TranscriptChunk]:
+) -> List[ChunkHit]:
     """
     Search across multiple companies in watchlist.
     """
-    query_embedding = await get_embedding(query)
+    backend = get_vector_backend()
+    event_ids = []
+    if settings.retrieval_mode != "vector":
+        event_ids = (await db.execute(select(Event.id).where(Event.ticker.in_(ticker_list)))).scalars().all()
+    return await retrieve_chunks(
+        query, db, event_ids, limit,
+        lambda embedding, fetch: backend.search_tickers(embedding, ticker_list, db, fetch)
+    )
+
+
+async def search_similar_chunks_batch(
+    queries: List[str],
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]],
+    db: AsyncSession,
+    limit: int
+) -> List[List[ChunkHit]]:
+    """
+    Retrieval for several questions over one event or ticker set. All
+    questions that need a vector search are embedded in one request and
+    searched in one vectorized pass; lexical search and fusion then run
+    per question exactly as in retrieve_chunks.
+    """
+    backend = get_vector_backend()
+    if event_id:
+        event_ids = [event_id]
+    else:
+        event_ids = (await db.execute(select(Event.id).where(Event.ticker.in_(ticker_list)))).scalars().all()
+    
+    mode = settings.retrieval_mode
+    needs_vectors = [
+        i for i, query in enumerate(queries)
+        if mode == "vector" or (mode == "hybrid" and not is_exact_lookup(query))
+    ]
+    embeddings = await get_query_embeddings([queries[i] for i in needs_vectors]) if needs_vectors else []
+    embedded = {i: embedding for i, embedding in zip(needs_vectors, embeddings) if embedding is not None}
+    
+    fetch = max(limit * settings.hybrid_candidate_factor, settings.mmr_candidates if settings.mmr_enabled else limit)
+    if not embedded:
+        nearest = []
+    elif event_id:
+        nearest = await backend.search_event_batch(list(embedded.values()), event_id, db, fetch)
+    else:
+        nearest = await backend.search_tickers_batch(list(embedded.values()), ticker_list, db, fetch)
+    nearest = dict(zip(embedded, nearest))
+    
+    async def search(embedding: List[float], k: int) -> List[ChunkHit]:
+        if event_id:
+            return await backend.search_event(embedding, event_id, db, k)
+        return await backend.search_tickers(embedding, ticker_list, db, k)
+    
+    results = []
+    for i, query in enumerate(queries):
+        if i in nearest:
+            async def precomputed(embedding: List[float], k: int, hits: List[ChunkHit] = nearest[i]) -> List[ChunkHit]:
+                return hits[:k]
+            results.append(await retrieve_chunks(query, db, event_ids, limit, precomputed, embedded[i]))
+        else:
+            results.append(await retrieve_chunks(query, db, event_ids, limit, search))
+    return results
+
+
+async def retrieve_chunks(
+    query: str,
+    db: AsyncSession,
+    event_ids: List[int],
+    limit: int,
+    vector_search: Callable[[List[float], int], Awaitable[List[ChunkHit]]],
+    query_embedding: Optional[List[float]] = None
+) -> List[ChunkHit]:
+    """
+    RETRIEVAL_MODE "vector" ranks by embedding distance only, "lexical" by
+    full-text score only. "hybrid" fuses both rankings with reciprocal-rank
+    fusion, except that ticker/number lookups which match lexically skip
+    the embedding call altogether. With MMR_ENABLED, rankings that involve
+    the query embedding are cut to MMR_CANDIDATES and then diversified.
+    A precomputed query_embedding is used instead of embedding the query.
+    """
+    async def embed() -> List[float]:
+        return query_embedding if query_embedding is not None else await get_query_embedding(query)
+    
+    mode = settings.retrieval_mode
+    pool = max(limit, settings.mmr_candidates) if settings.mmr_enabled else limit
+    if mode == "vector":
+        query_embedding = await embed()
+        return await diversify(query_embedding, await vector_search(query_embedding, pool), limit, db)
+    if mode == "lexical":
+        lexical = await search_lexical(query, db, event_ids, limit)
+        return await fetch_hits(db, [chunk_id for chunk_id, _ in lexical])
+    if mode != "hybrid":
+        raise ValueError(f"Unknown retrieval mode: {mode}")
     
-    from sqlalchemy import select
-    from app.models.models import Event
+    fetch = limit * settings.hybrid_candidate_factor
+    if is_exact_lookup(query):
+        lexical = await search_lexical(query, db, event_ids, fetch)
+        if lexical:
+            return await fetch_hits(db, [chunk_id for chunk_id, _ in lexical[:limit]])
+        query_embedding = await embed()
+        return await diversify(query_embedding, await vector_search(query_embedding, pool), limit, db)
     
-    stmt = (
-        select(TranscriptChunk)
-        .join(Transcript)
-        .join(Event)
-        .where(Event.ticker.in_(ticker_list))
-        .order_by(TranscriptChunk.embedding.l2_distance(query_embedding))
-        .limit(limit)
+    # The embedding request does not touch the session, so it overlaps the full-text query
+    query_embedding, lexical = await asyncio.gather(
+        embed(),
+        search_lexical(query, db, event_ids, fetch)
     )
+    vector_chunks = await vector_search(query_embedding, max(fetch, pool))
+    if not lexical:
+        return await diversify(query_embedding, vector_chunks[:pool], limit, db)
     
-    result = db.execute(stmt)
-    return result.scalars().all()
+    fused = reciprocal_rank_fusion(
+        [[chunk.id for chunk in vector_chunks], [chunk_id for chunk_id, _ in lexical]],
+        k=settings.rrf_k
+    )[:pool]
+    by_id = {chunk.id: chunk for chunk in vector_chunks}
+    missing = [chunk_id for chunk_id in fused if chunk_id not in by_id]
+    by_id.update({hit.id: hit for hit in await fetch_hits(db, missing)})
+    return await diversify(query_embedding, [by_id[chunk_id] for chunk_id in fused if chunk_id in by_id], limit, db)
+
+
+async def diversify(
+    query_embedding: List[float],
+    hits: List[ChunkHit],
+    limit: int,
+    db: AsyncSession
+) -> List[ChunkHit]:
+    """
+    Pick limit of the candidate hits by Maximal Marginal Relevance, so
+    overlapping windows of one passage do not crowd out other passages.
+    Returns the top limit unchanged when MMR is disabled.
+    """
+    if not settings.mmr_enabled or len(hits) <= limit:
+        return hits[:limit]
+    # Vector hits carry their embeddings; only lexical-only candidates need a lookup
+    missing = [i for i, hit in enumerate(hits) if hit.embedding is None]
+    fetched = await fetch_embeddings(db, [hits[i].id for i in missing]) if missing else None
+    vectors = np.zeros((len(hits), settings.pgvector_dim), dtype=np.float32)
+    for i, hit in enumerate(hits):
+        if hit.embedding is not None:
+            vectors[i] = hit.embedding
+    if missing:
+        vectors[missing] = fetched
+    selected = maximal_marginal_relevance(
+        np.asarray(query_embedding, dtype=np.float32), vectors, limit, settings.mmr_lambda
+    )
+    return [hits[i] for i in selected]
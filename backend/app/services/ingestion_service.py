@@ -0,0 +1,212 @@
+from typing import Any, Dict, List, Optional, Sequence
+from datetime import datetime, timezone
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.models import Event, Transcript, TranscriptChunk, Summary, QAItem, EventStatus
+from app.providers.base import TranscriptData
+from app.services.embedding_service import process_transcript_chunks
+from app.services.summarization_service import generate_summary
+from app.services.qa_service import extract_qa_items
+from app.services.transcript_parser import parse_transcript, ensure_structured
+from app.services.vector_index import get_vector_backend
+from app.services.rag_service import invalidate_answers
+from app.services.quote_locator import get_locators, invalidate_locator
+from app.services.rate_limiter import priority_lane, INGESTION
+from app.services.single_flight import SingleFlight
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INGESTION_STAGES = ("chunks", "summary", "qa")
+
+# Serializes the read-modify-write of event.meta_data between concurrent stages
+_record_lock = asyncio.Lock()
+
+# A poll can list the same provider event twice, and a retry can overlap a
+# running stage; the duplicate call joins the one in flight
+ingest_flight = SingleFlight("ingestion")
+stage_flight = SingleFlight("ingestion_stages")
+
+
+async def ingest_transcript(data: TranscriptData, db: AsyncSession) -> Optional[Event]:
+    """
+    Store a provider transcript as Event/Transcript rows, then run chunking,
+    summarization and Q&A extraction concurrently.
+    Returns None if the provider event was already ingested. A call made
+    while the same provider event is being ingested waits for that ingest
+    and returns its event.
+    """
+    if data.provider_event_id:
+        event_id = await ingest_flight.do(data.provider_event_id, lambda: _ingest(data, db))
+    else:
+        event_id = await _ingest(data, db)
+    return await db.get(Event, event_id) if event_id else None
+
+
+async def _ingest(data: TranscriptData, db: AsyncSession) -> Optional[int]:
+    if data.provider_event_id:
+        existing = (await db.execute(
+            select(Event.id).where(Event.provider_event_id == data.provider_event_id)
+        )).first()
+        if existing:
+            logger.info(f"Skipping already ingested event {data.provider_event_id}")
+            return None
+    
+    metadata = dict(data.metadata)
+    metadata["ingestion"] = {stage: {"status": "pending"} for stage in INGESTION_STAGES}
+    
+    event = Event(
+        ticker=data.ticker,
+        company_name=data.company_name,
+        event_status=EventStatus.COMPLETED,
+        event_date=data.event_date,
+        quarter=data.quarter,
+        fiscal_year=data.fiscal_year,
+        audio_url=data.audio_url,
+        provider=settings.transcript_provider,
+        provider_event_id=data.provider_event_id,
+        meta_data=metadata
+    )
+    db.add(event)
+    await db.flush()
+    
+    transcript = Transcript(
+        event_id=event.id,
+        raw_text=data.transcript_text,
+        structured_data=parse_transcript(data.transcript_text)
+    )
+    db.add(transcript)
+    await db.commit()
+    
+    logger.info(f"Ingesting {data.ticker} transcript as event {event.id}")
+    await run_ingestion_stages(event.id)
+    
+    await db.refresh(event)
+    return event.id
+
+
+async def run_ingestion_stages(
+    event_id: int,
+    stages: Sequence[str] = INGESTION_STAGES,
+    lane: str = INGESTION
+) -> Dict[str, bool]:
+    """
+    Run the given stages concurrently, each in its own session, so total
+    time is that of the slowest stage. Their OpenAI calls wait in the given
+    rate-limiter lane. Returns success per stage.
+    """
+    unknown = set(stages) - set(INGESTION_STAGES)
+    if unknown:
+        raise ValueError(f"Unknown ingestion stages: {sorted(unknown)}")
+    
+    with priority_lane(lane):
+        results = await asyncio.gather(*(run_stage(event_id, stage) for stage in stages))
+    return dict(zip(stages, results))
+
+
+async def run_stage(event_id: int, stage: str) -> bool:
+    """
+    Run one ingestion stage, replacing any output of an earlier attempt,
+    and record its status and timing on the event. A call for a stage
+    already running on the event waits for that run and shares its result.
+    Stages open their own sessions, so this raises RuntimeError up front when
+    the async engine is unavailable, since no status could be recorded.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine not available, cannot run ingestion stages")
+    return await stage_flight.do((event_id, stage), lambda: _run_stage(event_id, stage))
+
+
+async def _run_stage(event_id: int, stage: str) -> bool:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        try:
+            transcript = (await db.execute(
+                select(Transcript).where(Transcript.event_id == event_id)
+            )).scalars().first()
+            if not transcript:
+                raise ValueError(f"Event {event_id} has no transcript")
+            ticker = await db.scalar(select(Event.ticker).where(Event.id == event_id))
+            
+            await _record_stage(event_id, stage, status="running", started_at=_now())
+            await _clear_stage_output(db, transcript, stage, ticker)
+            
+            structured = ensure_structured(transcript.raw_text, transcript.structured_data)
+            if stage == "chunks":
+                await process_transcript_chunks(transcript.id, transcript.raw_text, db, structured)
+                # Build the citation index now rather than on the first chat query
+                await get_locators(db, [event_id])
+            elif stage == "summary":
+                await generate_summary(event_id, transcript.raw_text, db, structured)
+            elif stage == "qa":
+                await extract_qa_items(event_id, transcript.raw_text, db, structured)
+            
+            if stage in ("chunks", "summary"):
+                invalidate_answers(event_id, ticker)
+            
+            await _record_stage(
+                event_id, stage,
+                status="completed",
+                finished_at=_now(),
+                duration_ms=round((time.perf_counter() - started) * 1000),
+                error=None
+            )
+            return True
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Ingestion stage {stage} failed for event {event_id}: {e}")
+            await _record_stage(
+                event_id, stage,
+                status="failed",
+                finished_at=_now(),
+                duration_ms=round((time.perf_counter() - started) * 1000),
+                error=str(e)
+            )
+            return False
+
+
+def pending_stages(event: Event) -> List[str]:
+    """Stages that have not completed, in pipeline order"""
+    status = (event.meta_data or {}).get("ingestion", {})
+    return [stage for stage in INGESTION_STAGES if status.get(stage, {}).get("status") != "completed"]
+
+
+async def _clear_stage_output(db: AsyncSession, transcript: Transcript, stage: str, ticker: str):
+    if stage == "chunks":
+        await db.execute(delete(TranscriptChunk).where(TranscriptChunk.transcript_id == transcript.id))
+        get_vector_backend().invalidate_event(transcript.event_id)
+        invalidate_locator(transcript.event_id)
+        invalidate_answers(transcript.event_id, ticker)
+    elif stage == "summary":
+        await db.execute(delete(Summary).where(Summary.event_id == transcript.event_id))
+        invalidate_answers(transcript.event_id, ticker)
+    elif stage == "qa":
+        await db.execute(delete(QAItem).where(QAItem.event_id == transcript.event_id))
+    await db.commit()
+
+
+async def _record_stage(event_id: int, stage: str, **fields: Any):
+    """
+    Merge fields into event.meta_data["ingestion"][stage].
+    Uses a short-lived session so concurrent stages never write stale JSON.
+    """
+    async with _record_lock, AsyncSessionLocal() as db:
+        event = await db.get(Event, event_id)
+        if not event:
+            return
+        
+        meta_data = dict(event.meta_data or {})
+        ingestion = dict(meta_data.get("ingestion", {}))
+        ingestion[stage] = {**ingestion.get(stage, {}), **fields}
+        meta_data["ingestion"] = ingestion
+        event.meta_data = meta_data
+        await db.commit()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,135 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import text, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TERM = re.compile(r"[A-Za-z0-9]+(?:\.[0-9]+)*")
+PUNCTUATION = ".,;:!?\"'()"
+
+# Tickers ("MSFT"), numbers and amounts ("$52-54", "30%", "Q3", "FY2024")
+EXACT_TOKEN = re.compile(
+    r"^(?:[A-Z]{1,5}|\$?\d[\d,.]*(?:-\d[\d,.]*)?(?:%|[kmb]n?|bps)?|[QH][1-4]|FY\d{2,4})$",
+    re.IGNORECASE
+)
+
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been before but by can could did do does for from had
+has have how i if in into is it its just me more most my no not of on or our over said say says so
+some than that the their them then there these they this to up us was we were what when where which
+who why will with would you your management company call quarter tell talk talked discuss discussed
+""".split())
+
+# A missing index is re-checked after this long, so a migration run while the app is up is picked up
+FTS_RECHECK_SECONDS = 60
+
+_available = False
+_missing_checked_at: Optional[float] = None
+
+
+def query_terms(question: str) -> List[str]:
+    """Lower-cased content words of the question, in order, without duplicates"""
+    terms = []
+    for match in TERM.finditer(question):
+        term = match.group(0).lower()
+        if term not in STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def is_exact_lookup(question: str) -> bool:
+    """
+    True when most content tokens are tickers or numbers. For such queries
+    term matching beats embeddings and the embedding call can be skipped.
+    """
+    tokens = [token.strip(PUNCTUATION) for token in question.split()]
+    tokens = [token for token in tokens if token and token.lower() not in STOPWORDS]
+    if not tokens:
+        return False
+    
+    # Plain lower-case words like "cloud" are not tickers
+    exact = sum(
+        1 for token in tokens
+        if EXACT_TOKEN.match(token) and (not token.isalpha() or token.isupper())
+    )
+    return exact * 2 >= len(tokens)
+
+
+async def _fts_available(db: AsyncSession) -> bool:
+    """
+    Whether the full-text migration has run on this database. Only a positive
+    answer is kept for good; a missing index is checked again after FTS_RECHECK_SECONDS.
+    """
+    global _available, _missing_checked_at
+    if _available:
+        return True
+    if _missing_checked_at is not None and time.monotonic() - _missing_checked_at < FTS_RECHECK_SECONDS:
+        return False
+    
+    if db.bind.dialect.name == "postgresql":
+        stmt = text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'transcript_chunks' AND column_name = 'text_search'"
+        )
+    else:
+        stmt = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transcript_chunks_fts'")
+    _available = (await db.execute(stmt)).first() is not None
+    if not _available:
+        if _missing_checked_at is None:
+            logger.warning("Full-text index missing, run alembic upgrade head to enable lexical retrieval")
+        _missing_checked_at = time.monotonic()
+    return _available
+
+
+async def search_lexical(
+    question: str,
+    db: AsyncSession,
+    event_ids: Sequence[int],
+    limit: int
+) -> List[Tuple[int, float]]:
+    """
+    Chunk ids matching any query term, best first, with their score:
+    BM25 from FTS5 on SQLite (lower is better), ts_rank_cd on Postgres (higher is better).
+    """
+    terms = query_terms(question)
+    if not terms or not event_ids or not await _fts_available(db):
+        return []
+    
+    if db.bind.dialect.name == "postgresql":
+        stmt = text(
+            "SELECT c.id, ts_rank_cd(c.text_search, q.query) AS score "
+            "FROM transcript_chunks c, to_tsquery('english', :match) AS q(query) "
+            "WHERE c.text_search @@ q.query AND c.event_id IN :event_ids "
+            "ORDER BY score DESC LIMIT :limit"
+        )
+        match = " | ".join(terms)
+    else:
+        stmt = text(
+            "SELECT c.id, bm25(transcript_chunks_fts) AS score "
+            "FROM transcript_chunks_fts "
+            "JOIN transcript_chunks c ON c.id = transcript_chunks_fts.rowid "
+            "WHERE transcript_chunks_fts MATCH :match AND c.event_id IN :event_ids "
+            "ORDER BY score LIMIT :limit"
+        )
+        match = " OR ".join(f'"{term}"' for term in terms)
+    
+    stmt = stmt.bindparams(bindparam("event_ids", expanding=True))
+    rows = await db.execute(stmt, {"match": match, "event_ids": list(event_ids), "limit": limit})
+    return [(row[0], float(row[1])) for row in rows]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    """
+    Merge ranked id lists by sum of 1 / (k + rank). Only ranks matter, so
+    BM25 and vector distances need no score normalization.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: scores[item], reverse=True)
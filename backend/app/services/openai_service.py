@@ -1,52 +1,229 @@
-from openai import AsyncOpenAI
-from typing import List, Dict, Any
+from openai import AsyncOpenAI, BadRequestError
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.config import get_settings
+from app.services import embedding_cache, completion_cache
+from app.services.rate_limiter import RateLimiter, call_with_limits
+from app.services.single_flight import SingleFlight
+from functools import lru_cache
+import asyncio
+import re
 import tiktoken
 import logging
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+# Retries go through call_with_limits so they wait in the rate limiter like any other request
+client = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
 
+chat_limiter = RateLimiter("chat", settings.openai_chat_rpm, settings.openai_chat_tpm)
+embedding_limiter = RateLimiter("embeddings", settings.openai_embedding_rpm, settings.openai_embedding_tpm)
+
+# Identical requests already in flight share one API call instead of each making their own
+embedding_flight = SingleFlight("embeddings")
+completion_flight = SingleFlight("completions")
 
-async def get_embedding(text: str, model: str = "text-embedding-3-large") -> List[float]:
-    """Generate embedding for text using OpenAI"""
-    try:
-        response = await client.embeddings.create(
-            model=model,
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        logger.error(f"Error generating embedding: {e}")
-        raise
+
+async def limited(limiter: RateLimiter, tokens: int, call, max_retries: Optional[int] = None):
+    return await call_with_limits(
+        limiter,
+        tokens,
+        call,
+        max_retries=settings.openai_max_retries if max_retries is None else max_retries,
+        backoff_base=settings.openai_backoff_base_seconds,
+        backoff_max=settings.openai_backoff_max_seconds
+    )
+
+
+def _chat_tokens(messages: List[Dict[str, str]], model: str, max_tokens: int) -> int:
+    """Prompt tokens plus max_tokens, which is what OpenAI counts against tokens/min"""
+    return sum(count_tokens(message.get("content") or "", model) + 4 for message in messages) + max_tokens
+
+
+async def get_embedding(
+    text: str,
+    model: str = "text-embedding-3-large",
+    dimensions: Optional[int] = None
+) -> List[float]:
+    """Generate embedding for text using OpenAI, served from the embedding cache when possible"""
+    cached = (await embedding_cache.get_cached([text], model, dimensions))[0]
+    if cached is not None:
+        return cached
+    
+    async def embed() -> List[float]:
+        try:
+            response = await limited(embedding_limiter, count_tokens(text), lambda: client.embeddings.create(
+                model=model,
+                input=text,
+                **({"dimensions": dimensions} if dimensions else {})
+            ))
+            embedding = response.data[0].embedding
+        except Exception as e:
+            logger.error(f"Error generating embedding: {e}")
+            raise
+        
+        await embedding_cache.store([text], [embedding], model, dimensions)
+        return embedding
+    
+    return await embedding_flight.do(embedding_cache.make_key(text, model, dimensions), embed)
+
+
+async def get_embeddings_batch(
+    texts: List[str],
+    model: str = "text-embedding-3-large",
+    batch_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    dimensions: Optional[int] = None
+) -> List[Optional[List[float]]]:
+    """
+    Generate embeddings for many texts, several inputs per request.
+    Batches run concurrently up to max_concurrency. Transient failures retry
+    only the failed batch through the rate limiter; a rejected batch is split in half to
+    isolate the offending input. Cached texts are never sent, and duplicate
+    texts are embedded once. Returns one embedding per input, None where
+    embedding failed.
+    """
+    batch_size = batch_size or settings.embedding_batch_size
+    semaphore = asyncio.Semaphore(max_concurrency or settings.embedding_max_concurrency)
+    results = await embedding_cache.get_cached(texts, model, dimensions)
+    
+    pending: Dict[str, List[int]] = {}
+    for i, (text, embedding) in enumerate(zip(texts, results)):
+        if embedding is None:
+            pending.setdefault(embedding_cache.normalize_text(text), []).append(i)
+    misses = [positions[0] for positions in pending.values()]
+    
+    async def embed_batch(indices: List[int]):
+        batch = [texts[i] for i in indices]
+        try:
+            async with semaphore:
+                response = await limited(
+                    embedding_limiter,
+                    sum(count_tokens(text) for text in batch),
+                    lambda: client.embeddings.create(
+                        model=model,
+                        input=batch,
+                        **({"dimensions": dimensions} if dimensions else {})
+                    ),
+                    max_retries=settings.embedding_max_retries - 1
+                )
+            for item in response.data:
+                results[indices[item.index]] = item.embedding
+        except BadRequestError as e:
+            if len(indices) == 1:
+                logger.error(f"Embedding input {indices[0]} rejected: {e}")
+                return
+            middle = len(indices) // 2
+            await asyncio.gather(embed_batch(indices[:middle]), embed_batch(indices[middle:]))
+        except Exception as e:
+            logger.error(f"Giving up on embedding batch starting at input {indices[0]}: {e}")
+    
+    async def embed_misses() -> List[Optional[List[float]]]:
+        batches = [misses[start:start + batch_size] for start in range(0, len(misses), batch_size)]
+        await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        
+        await embedding_cache.store([texts[i] for i in misses], [results[i] for i in misses], model, dimensions)
+        return [results[i] for i in misses]
+    
+    if misses:
+        # The same transcript ingested twice at once embeds its chunks once
+        embedded = await embedding_flight.do((model, dimensions, tuple(pending)), embed_misses)
+        for i, embedding in zip(misses, embedded):
+            results[i] = embedding
+    for positions in pending.values():
+        for i in positions[1:]:
+            results[i] = results[positions[0]]
+    
+    return results
 
 
 async def get_chat_completion(
     messages: List[Dict[str, str]],
     model: str = "gpt-4o-mini",
     temperature: float = 0.7,
-    max_tokens: int = 2000
+    max_tokens: int = 2000,
+    prompt_version: Optional[str] = None
 ) -> str:
-    """Get chat completion from OpenAI"""
+    """
+    Get chat completion from OpenAI, served from the completion cache when
+    enabled. Identical calls made while one is in flight share its result.
+    """
+    key = completion_cache.make_key(messages, model, temperature, max_tokens, prompt_version)
+    cached = await completion_cache.get_cached(key)
+    if cached is not None:
+        return cached
+    
+    async def complete() -> str:
+        try:
+            response = await limited(chat_limiter, _chat_tokens(messages, model, max_tokens), lambda: client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            ))
+            completion = response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Error getting chat completion: {e}")
+            raise
+        
+        await completion_cache.store(key, completion)
+        return completion
+    
+    return await completion_flight.do(key, complete)
+
+
+async def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    prompt_version: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Yield completion text deltas as OpenAI streams them. A cached
+    completion is yielded as one delta; a streamed one is cached once complete.
+    """
+    key = completion_cache.make_key(messages, model, temperature, max_tokens, prompt_version)
+    cached = await completion_cache.get_cached(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    deltas = []
     try:
-        response = await client.chat.completions.create(
+        stream = await limited(chat_limiter, _chat_tokens(messages, model, max_tokens), lambda: client.chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content
+            max_tokens=max_tokens,
+            stream=True
+        ))
+        async for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                deltas.append(event.choices[0].delta.content)
+                yield event.choices[0].delta.content
     except Exception as e:
-        logger.error(f"Error getting chat completion: {e}")
+        logger.error(f"Error streaming chat completion: {e}")
         raise
+    
+    await completion_cache.store(key, "".join(deltas))
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Load a tokenizer once per process"""
+    return tiktoken.get_encoding(name)
+
+
+@lru_cache(maxsize=None)
+def _encoding_for_model(model: str) -> tiktoken.Encoding:
+    return tiktoken.encoding_for_model(model)
 
 
 def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
     """Count tokens in text"""
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        encoding = _encoding_for_model(model)
         return len(encoding.encode(text))
     except:
         return len(text) // 4
@@ -55,10 +232,12 @@ def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
 def chunk_text(text: str, max_tokens: int = 500, overlap: int = 50) -> List[Dict[str, Any]]:
     """
     Chunk text into segments of approximately max_tokens with overlap.
-    Returns list of chunks with metadata.
+    Returns list of chunks with metadata, including character offsets
+    into the original text.
     """
-    encoding = tiktoken.get_encoding("cl100k_base")
+    encoding = get_encoding()
     tokens = encoding.encode(text)
+    _, char_offsets = encoding.decode_with_offsets(tokens)
     chunks = []
     
     start = 0
@@ -74,10 +253,105 @@ def chunk_text(text: str, max_tokens: int = 500, overlap: int = 50) -> List[Dict
             "text": chunk_text,
             "token_count": len(chunk_tokens),
             "start_token": start,
-            "end_token": end
+            "end_token": end,
+            "start_char": char_offsets[start],
+            "end_char": char_offsets[end] if end < len(tokens) else len(text)
         })
         
         chunk_index += 1
         start = end - overlap if end < len(tokens) else end
     
     return chunks
+
+
+def chunk_utterances(text: str, structured: Dict[str, Any], max_tokens: int = 500) -> List[Dict[str, Any]]:
+    """
+    Chunk a parsed transcript by packing whole utterances up to max_tokens.
+    Turns longer than max_tokens are split at sentence boundaries, so chunks
+    never start mid-sentence or mid-speaker. Tokens are counted once per
+    utterance (or per sentence of a long utterance). Returns the same
+    metadata as chunk_text.
+    """
+    encoding = get_encoding()
+    
+    spans = [(u["start"], u["end"]) for u in structured["utterances"]]
+    if spans and spans[0][0] > 0 and text[:spans[0][0]].strip():
+        spans.insert(0, (0, spans[0][0]))
+    
+    # (start_char, end_char, token_count) units that are never split further
+    units = []
+    for start, end in spans:
+        token_count = len(encoding.encode(text[start:end]))
+        if token_count <= max_tokens:
+            units.append((start, end, token_count))
+        else:
+            units.extend(_split_sentences(text, start, end, max_tokens, encoding))
+    
+    chunks = []
+    current: List[tuple] = []
+    current_tokens = 0
+    token_offset = 0
+    
+    def flush():
+        nonlocal token_offset
+        start_char, end_char = current[0][0], current[-1][1]
+        chunk_body = text[start_char:end_char]
+        leading = len(chunk_body) - len(chunk_body.lstrip())
+        chunks.append({
+            "chunk_index": len(chunks),
+            "text": chunk_body.strip(),
+            "token_count": current_tokens,
+            "start_token": token_offset,
+            "end_token": token_offset + current_tokens,
+            "start_char": start_char + leading,
+            "end_char": start_char + len(chunk_body.rstrip())
+        })
+        token_offset += current_tokens
+    
+    for unit in units:
+        if current and current_tokens + unit[2] > max_tokens:
+            flush()
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit[2]
+    
+    if current:
+        flush()
+    
+    return chunks
+
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_sentences(text: str, start: int, end: int, max_tokens: int, encoding: tiktoken.Encoding) -> List[tuple]:
+    """Split one long utterance into sentence-aligned pieces of at most max_tokens"""
+    boundaries = [start] + [m.end() for m in SENTENCE_BOUNDARY.finditer(text, start, end)] + [end]
+    
+    pieces = []
+    piece_start, piece_tokens = start, 0
+    for sentence_start, sentence_end in zip(boundaries, boundaries[1:]):
+        if sentence_end <= sentence_start:
+            continue
+        sentence_tokens = len(encoding.encode(text[sentence_start:sentence_end]))
+        
+        if piece_tokens and piece_tokens + sentence_tokens > max_tokens:
+            pieces.append((piece_start, sentence_start, piece_tokens))
+            piece_start, piece_tokens = sentence_start, 0
+        
+        if sentence_tokens > max_tokens:
+            # A single run-on sentence: fall back to token windows
+            tokens = encoding.encode(text[sentence_start:sentence_end])
+            _, offsets = encoding.decode_with_offsets(tokens)
+            for window in range(0, len(tokens), max_tokens):
+                window_end = min(window + max_tokens, len(tokens))
+                char_end = sentence_start + offsets[window_end] if window_end < len(tokens) else sentence_end
+                pieces.append((sentence_start + offsets[window], char_end, window_end - window))
+            piece_start, piece_tokens = sentence_end, 0
+        else:
+            piece_tokens += sentence_tokens
+    
+    if piece_tokens:
+        pieces.append((piece_start, end, piece_tokens))
+    
+    return pieces
@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional
+from pathlib import Path
+from app.config import get_settings
+from app.services.openai_service import count_tokens
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# backend/prompts, independent of the working directory
+DEFAULT_PROMPTS_DIR = Path(__file__).resolve().parents[2] / "prompts"
+
+# Prompts the services need, with text each must contain to be usable
+REQUIRED_PROMPTS = {
+    "chat_system": ["[quote"],
+    "extractive": ["JSON", "quote", "timestamp"],
+    "abstractive": ["JSON", "quicktake", "guidance", "delta_analysis"]
+}
+
+
+class PromptError(Exception):
+    """A prompt file is missing or fails validation"""
+    pass
+
+
+class Prompt:
+    """A loaded prompt with its token count and content version"""
+    
+    __slots__ = ("name", "text", "token_count", "version")
+    
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.token_count = count_tokens(text)
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    
+    def info(self) -> Dict[str, object]:
+        return {"name": self.name, "version": self.version, "token_count": self.token_count}
+
+
+class PromptRegistry:
+    """
+    All *.txt prompts of one directory, read once and validated together.
+    reload() swaps in a new set only if every prompt passes validation,
+    so a bad edit never replaces working prompts.
+    """
+    
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._prompts: Optional[Dict[str, Prompt]] = None
+        self._lock = threading.Lock()
+    
+    def load(self) -> Dict[str, Prompt]:
+        prompts = {}
+        for path in sorted(self.directory.glob("*.txt")):
+            prompts[path.stem] = Prompt(path.stem, path.read_text(encoding="utf-8"))
+        
+        for name, markers in REQUIRED_PROMPTS.items():
+            prompt = prompts.get(name)
+            if prompt is None:
+                raise PromptError(f"Prompt {name}.txt not found in {self.directory}")
+            if not prompt.text.strip():
+                raise PromptError(f"Prompt {name}.txt is empty")
+            missing = [marker for marker in markers if marker not in prompt.text]
+            if missing:
+                raise PromptError(f"Prompt {name}.txt is missing {', '.join(missing)}")
+        
+        with self._lock:
+            self._prompts = prompts
+        logger.info(f"Loaded {len(prompts)} prompts from {self.directory}: " + ", ".join(
+            f"{prompt.name}@{prompt.version} ({prompt.token_count} tokens)" for prompt in prompts.values()
+        ))
+        return prompts
+    
+    def reload(self) -> List[Dict[str, object]]:
+        """Re-read prompts from disk; raises PromptError and keeps the current set on failure"""
+        self.load()
+        return self.list()
+    
+    def get(self, name: str) -> Prompt:
+        prompts = self._prompts if self._prompts is not None else self.load()
+        if name not in prompts:
+            raise PromptError(f"Unknown prompt {name}")
+        return prompts[name]
+    
+    def list(self) -> List[Dict[str, object]]:
+        prompts = self._prompts if self._prompts is not None else self.load()
+        return [prompt.info() for prompt in prompts.values()]
+
+
+prompt_registry = PromptRegistry(Path(settings.prompts_dir) if settings.prompts_dir else DEFAULT_PROMPTS_DIR)
+
+
+def get_prompt(name: str) -> Prompt:
+    return prompt_registry.get(name)
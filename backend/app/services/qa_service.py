@@ -1,20 +1,25 @@
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.models import Event, QAItem
 from app.services.openai_service import get_chat_completion
-import re
+from app.services.transcript_parser import ensure_structured, utterance_text, is_analyst
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-async def extract_qa_items(event_id: int, transcript_text: str, db: Session) -> List[QAItem]:
+async def extract_qa_items(
+    event_id: int,
+    transcript_text: str,
+    db: AsyncSession,
+    structured: Optional[Dict[str, Any]] = None
+) -> List[QAItem]:
     """
     Extract Q&A items from transcript with analyst info and deflection scoring
     """
     logger.info(f"Extracting Q&A for event {event_id}")
     
-    qa_blocks = parse_qa_section(transcript_text)
+    qa_blocks = parse_qa_section(transcript_text, structured)
     
     qa_items = []
     for idx, qa in enumerate(qa_blocks):
@@ -38,53 +43,43 @@ async def extract_qa_items(event_id: int, transcript_text: str, db: Session) ->
         qa_items.append(qa_item)
         db.add(qa_item)
     
-    db.commit()
+    await db.commit()
     logger.info(f"Extracted {len(qa_items)} Q&A items for event {event_id}")
     return qa_items
 
 
-def parse_qa_section(transcript: str) -> List[Dict[str, Any]]:
+def parse_qa_section(transcript: str, structured: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """
-    Parse Q&A section from transcript
+    Group Q&A-section utterances into analyst question / management answer blocks
     """
-    qa_blocks = []
+    structured = ensure_structured(transcript, structured)
     
-    lines = transcript.split("\n")
-    in_qa_section = False
+    qa_blocks = []
     current_qa = None
     
-    for line in lines:
-        if "Q&A" in line or "question" in line.lower() and "answer" in line.lower():
-            in_qa_section = True
+    for utterance in structured["utterances"]:
+        if utterance["section"] != "qa" or utterance["role"] == "operator":
             continue
         
-        if not in_qa_section:
-            continue
+        text = utterance_text(transcript, utterance)
         
-        timestamp_match = re.match(r'\[(\d{2}:\d{2}:\d{2})\]', line.strip())
-        if timestamp_match:
-            timestamp = timestamp_match.group(1)
-            
-            analyst_pattern = r'\[?\d{2}:\d{2}:\d{2}\]?\s*([A-Za-z\s]+)(?:,\s*([A-Za-z\s&]+))?:'
-            analyst_match = re.search(analyst_pattern, line)
+        if is_analyst(utterance):
+            if current_qa and current_qa.get("question"):
+                qa_blocks.append(current_qa)
             
-            if analyst_match:
-                if current_qa and current_qa.get("question"):
-                    qa_blocks.append(current_qa)
-                
-                current_qa = {
-                    "analyst_name": analyst_match.group(1).strip() if analyst_match.group(1) else None,
-                    "analyst_firm": analyst_match.group(2).strip() if analyst_match.group(2) else None,
-                    "question_timestamp": timestamp,
-                    "question": line[analyst_match.end():].strip(),
-                    "answer": "",
-                    "answer_timestamp": None
-                }
-            elif current_qa and not current_qa.get("answer"):
-                current_qa["answer_timestamp"] = timestamp
-                current_qa["answer"] = line[timestamp_match.end():].strip()
-            elif current_qa:
-                current_qa["answer"] += " " + line.strip()
+            current_qa = {
+                "analyst_name": utterance["speaker"],
+                "analyst_firm": utterance["firm"],
+                "question_timestamp": utterance["timestamp"],
+                "question": text,
+                "answer": "",
+                "answer_timestamp": None
+            }
+        elif current_qa and not current_qa.get("answer"):
+            current_qa["answer_timestamp"] = utterance["timestamp"]
+            current_qa["answer"] = text
+        elif current_qa:
+            current_qa["answer"] += " " + text
     
     if current_qa and current_qa.get("question"):
         qa_blocks.append(current_qa)
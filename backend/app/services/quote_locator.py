@@ -0,0 +1,205 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.models.models import Transcript, TranscriptChunk
+from app.services.cache import TTLCache
+from bisect import bisect_left, bisect_right
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Quotes are matched word by word, ignoring case, punctuation and whitespace
+WORD = re.compile(r"[^\W_]+")
+TIMESTAMP = re.compile(r"\[(\d{2}:\d{2}:\d{2})\]")
+
+# Words per indexed n-gram; quotes shorter than this are matched by scanning
+GRAM_SIZE = 3
+
+# A paraphrased quote is accepted when this share of its n-grams line up
+MIN_FUZZY_COVERAGE = 0.5
+
+# Entries are checked against the chunk table on every lookup; the TTL only frees idle ones
+locator_cache = TTLCache(max_entries=settings.quote_locator_cache_size, ttl_seconds=86400)
+
+
+class QuoteMatch:
+    """Where a quote sits in the raw transcript"""
+    
+    __slots__ = ("start_char", "end_char", "chunk_ids", "timestamp", "exact")
+    
+    def __init__(self, start_char: int, end_char: int, chunk_ids: List[int], timestamp: Optional[str], exact: bool):
+        self.start_char = start_char
+        self.end_char = end_char
+        self.chunk_ids = chunk_ids
+        self.timestamp = timestamp
+        self.exact = exact
+
+
+class QuoteLocator:
+    """
+    Word n-gram hash index over one transcript. Maps a quote to character
+    offsets in the raw text, the chunks covering them and the nearest
+    preceding timestamp. Lookups touch only the positions of the quote's
+    rarest n-gram, so they stay well under a millisecond.
+    """
+    
+    def __init__(self, raw_text: str, chunk_spans: Sequence[Tuple[int, int, int]] = ()):
+        self.words: List[str] = []
+        self.word_starts: List[int] = []
+        self.word_ends: List[int] = []
+        for match in WORD.finditer(raw_text):
+            self.words.append(match.group(0).casefold())
+            self.word_starts.append(match.start())
+            self.word_ends.append(match.end())
+        
+        self.grams: Dict[Tuple[str, ...], List[int]] = {}
+        for i in range(len(self.words) - GRAM_SIZE + 1):
+            self.grams.setdefault(tuple(self.words[i:i + GRAM_SIZE]), []).append(i)
+        
+        # (start_char, end_char, chunk_id) sorted by start
+        self.chunk_spans = sorted(chunk_spans)
+        self.chunk_starts = [span[0] for span in self.chunk_spans]
+        
+        stamps = [(match.start(), match.group(1)) for match in TIMESTAMP.finditer(raw_text)]
+        self.stamp_offsets = [offset for offset, _ in stamps]
+        self.stamps = [stamp for _, stamp in stamps]
+    
+    def locate(self, quote: str) -> Optional[QuoteMatch]:
+        """Exact word-sequence match first, then the best partial alignment"""
+        words = [word.casefold() for word in WORD.findall(quote)]
+        if not words:
+            return None
+        
+        if len(words) < GRAM_SIZE:
+            for i in range(len(self.words) - len(words) + 1):
+                if self.words[i:i + len(words)] == words:
+                    return self._match(i, i + len(words) - 1, exact=True)
+            return None
+        
+        grams = [tuple(words[j:j + GRAM_SIZE]) for j in range(len(words) - GRAM_SIZE + 1)]
+        anchor = min(range(len(grams)), key=lambda j: len(self.grams.get(grams[j], ())))
+        for position in self.grams.get(grams[anchor], ()):
+            start = position - anchor
+            if start >= 0 and self.words[start:start + len(words)] == words:
+                return self._match(start, start + len(words) - 1, exact=True)
+        
+        # Quotes with a dropped or changed word: vote for the start each n-gram implies
+        votes: Dict[int, List[int]] = {}
+        for j, gram in enumerate(grams):
+            for position in self.grams.get(gram, ()):
+                votes.setdefault(position - j, []).append(j)
+        if not votes:
+            return None
+        start, matched = max(votes.items(), key=lambda item: len(item[1]))
+        if len(matched) < MIN_FUZZY_COVERAGE * len(grams):
+            return None
+        return self._match(start + matched[0], start + matched[-1] + GRAM_SIZE - 1, exact=False)
+    
+    def _match(self, first_word: int, last_word: int, exact: bool) -> QuoteMatch:
+        start_char = self.word_starts[first_word]
+        end_char = self.word_ends[last_word]
+        
+        chunk_ids = [
+            chunk_id for chunk_start, chunk_end, chunk_id in self.chunk_spans[:bisect_left(self.chunk_starts, end_char)]
+            if chunk_end > start_char
+        ]
+        
+        stamp = bisect_right(self.stamp_offsets, start_char)
+        if stamp:
+            timestamp = self.stamps[stamp - 1]
+        else:
+            timestamp = self.stamps[0] if self.stamps else None
+        
+        return QuoteMatch(start_char, end_char, chunk_ids, timestamp, exact)
+
+
+def chunk_span(raw_text: str, text: str, meta_data: Optional[Dict[str, Any]]) -> Optional[Tuple[int, int]]:
+    """Stored offsets, or the chunk text's position for chunks written without them"""
+    meta = meta_data or {}
+    if meta.get("start_char") is not None and meta.get("end_char") is not None:
+        return meta["start_char"], meta["end_char"]
+    start = raw_text.find(text)
+    return (start, start + len(text)) if start >= 0 else None
+
+
+async def get_locators(db: AsyncSession, event_ids: Iterable[int]) -> Dict[int, QuoteLocator]:
+    """
+    Locators for the given events, built on first use and cached.
+    Each entry is keyed by the event's chunk count and max id, so a
+    re-chunk in any worker rebuilds it.
+    """
+    event_ids = list(dict.fromkeys(event_id for event_id in event_ids if event_id is not None))
+    if not event_ids:
+        return {}
+    
+    rows = await db.execute(
+        select(TranscriptChunk.event_id, func.count(TranscriptChunk.id), func.max(TranscriptChunk.id))
+        .where(TranscriptChunk.event_id.in_(event_ids))
+        .group_by(TranscriptChunk.event_id)
+    )
+    stamps = {row[0]: (row[1], row[2]) for row in rows}
+    
+    locators = {}
+    for event_id in event_ids:
+        stamp = stamps.get(event_id, (0, None))
+        cached = locator_cache.get(event_id)
+        if cached is not None and cached[0] == stamp:
+            locators[event_id] = cached[1]
+            continue
+        
+        locator = await build_locator(db, event_id)
+        if locator is not None:
+            locator_cache.set(event_id, (stamp, locator))
+            locators[event_id] = locator
+    return locators
+
+
+async def build_locator(db: AsyncSession, event_id: int) -> Optional[QuoteLocator]:
+    raw_text = (await db.execute(
+        select(Transcript.raw_text).where(Transcript.event_id == event_id)
+    )).scalar_one_or_none()
+    if raw_text is None:
+        return None
+    
+    rows = await db.execute(
+        select(TranscriptChunk.id, TranscriptChunk.text, TranscriptChunk.meta_data)
+        .where(TranscriptChunk.event_id == event_id)
+    )
+    spans = []
+    for chunk_id, text, meta_data in rows:
+        span = chunk_span(raw_text, text, meta_data)
+        if span is not None:
+            spans.append((span[0], span[1], chunk_id))
+    
+    logger.debug(f"Built quote locator for event {event_id}: {len(spans)} chunks")
+    return QuoteLocator(raw_text, spans)
+
+
+def invalidate_locator(event_id: int):
+    locator_cache.pop(event_id)
+
+
+def verify_quotes(quotes: List[Dict[str, Any]], locator: QuoteLocator) -> List[Dict[str, Any]]:
+    """
+    Mark each extracted quote as verified or not against the transcript.
+    Verified quotes get their character offsets and the transcript's own
+    timestamp in place of the model's.
+    """
+    unverified = 0
+    for quote in quotes:
+        found = locator.locate(str(quote.get("quote", "")))
+        quote["verified"] = found is not None
+        if found is None:
+            unverified += 1
+            continue
+        quote["start_char"] = found.start_char
+        quote["end_char"] = found.end_char
+        if found.timestamp:
+            quote["timestamp"] = found.timestamp
+    
+    if unverified:
+        logger.warning(f"{unverified} of {len(quotes)} extracted quotes not found in transcript")
+    return quotes
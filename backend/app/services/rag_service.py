@@ -1,144 +1,439 @@
-from typing import Dict, Any, List, Optional
-from sqlalchemy.orm import Session
-from app.services.embedding_service import search_similar_chunks, search_similar_chunks_across_watchlist
-from app.services.openai_service import get_chat_completion
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.services.embedding_service import (
+    search_similar_chunks, search_similar_chunks_across_watchlist, search_similar_chunks_batch
+)
+from app.services.embedding_cache import normalize_text
+from app.services.openai_service import get_chat_completion, stream_chat_completion
+from app.services.cache import TTLCache
+from app.services.vector_index import ChunkHit
+from app.services.context_packer import pack_context
+from app.services.quote_locator import QuoteLocator, get_locators
+from app.services.prompt_registry import Prompt, get_prompt
 from app.models.models import TranscriptChunk, Summary, Event
+import asyncio
+import re
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CHAT_MODEL = "gpt-4o-mini"
+ANSWER_ERROR = "I encountered an error processing your question. Please try again."
+NO_SCOPE_ANSWER = "Please specify either an event or watchlist to query."
+
+CITATION_PATTERN = re.compile(r'\[quote\s+"([^"]+)",\s*ts\s+(\d{2}:\d{2}:\d{2})\]')
+
+answer_cache = TTLCache(
+    max_entries=settings.answer_cache_size,
+    ttl_seconds=settings.answer_cache_ttl_seconds
+)
+fingerprint_cache = TTLCache(
+    max_entries=settings.answer_cache_size,
+    ttl_seconds=settings.answer_fingerprint_ttl_seconds
+)
+# Bumped by invalidate_answers so a fingerprint loaded before an invalidation is not memoized after it
+_invalidations = 0
 
 
 async def query_rag(
     question: str,
     event_id: Optional[int],
     ticker_list: Optional[List[str]],
-    db: Session
+    db: AsyncSession,
+    bypass_cache: bool = False
 ) -> Dict[str, Any]:
     """
-    RAG query with strict grounding and citations
+    RAG query with strict grounding and citations.
+    Answers are cached per scope and question; bypass_cache forces a fresh answer.
     """
-    if event_id:
-        chunks = await search_similar_chunks(question, event_id, db, limit=5)
-        event = db.query(Event).filter(Event.id == event_id).first()
-        summary = db.query(Summary).filter(Summary.event_id == event_id).first()
-    elif ticker_list:
-        chunks = await search_similar_chunks_across_watchlist(question, ticker_list, db, limit=10)
-        event = None
-        summary = None
-    else:
+    if not event_id and not ticker_list:
         return {
-            "answer": "Please specify either an event or watchlist to query.",
+            "answer": NO_SCOPE_ANSWER,
             "citations": []
         }
     
+    system_prompt = get_prompt("chat_system")
+    cache_key = await answer_cache_key(question, event_id, ticker_list, system_prompt, db)
+    if cache_key is not None and not bypass_cache:
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "cached": True}
+    
+    chunks, summary = await retrieve_context(question, event_id, ticker_list, db)
     context = build_context(chunks, summary)
+    locators = await get_locators(db, [event_id] + [chunk.event_id for chunk in chunks])
     
-    answer_text, citations = await generate_grounded_answer(question, context, chunks)
+    answer_text, citations = await generate_grounded_answer(question, context, chunks, system_prompt, locators)
     
-    return {
+    result = {
         "answer": answer_text,
         "citations": citations,
-        "sources": [
-            {
-                "chunk_id": chunk.id,
-                "event_id": chunk.transcript.event_id if chunk.transcript else None,
-                "text": chunk.text[:200] + "...",
-                "timestamp": chunk.start_time
-            }
-            for chunk in chunks[:3]
-        ]
+        "sources": build_sources(chunks)
     }
+    
+    if cache_key is not None and answer_text != ANSWER_ERROR:
+        answer_cache.set(cache_key, result)
+    return {**result, "cached": False}
+
+
+async def stream_query_rag(
+    question: str,
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]],
+    db: AsyncSession,
+    bypass_cache: bool = False
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming variant of query_rag yielding (event, data) pairs:
+    "sources" right after retrieval, a "token" per completion delta, a
+    "citation" as soon as each [quote "...", ts HH:MM:SS] marker is complete,
+    then "done" with the full answer and citations. Any failure, including
+    retrieval, ends the stream with an "error" event.
+    """
+    try:
+        async for event, data in _stream_answer(question, event_id, ticker_list, db, bypass_cache):
+            yield event, data
+    except Exception as e:
+        logger.error(f"Error streaming answer: {e}")
+        yield "error", {"message": ANSWER_ERROR}
+
+
+async def _stream_answer(
+    question: str,
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]],
+    db: AsyncSession,
+    bypass_cache: bool
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    if not event_id and not ticker_list:
+        yield "done", {"answer": NO_SCOPE_ANSWER, "citations": [], "cached": False}
+        return
+    
+    system_prompt = get_prompt("chat_system")
+    cache_key = await answer_cache_key(question, event_id, ticker_list, system_prompt, db)
+    if cache_key is not None and not bypass_cache:
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            yield "sources", {"sources": cached["sources"]}
+            yield "token", {"text": cached["answer"]}
+            for citation in cached["citations"]:
+                yield "citation", citation
+            yield "done", {"answer": cached["answer"], "citations": cached["citations"], "cached": True}
+            return
+    
+    chunks, summary = await retrieve_context(question, event_id, ticker_list, db)
+    locators = await get_locators(db, [event_id] + [chunk.event_id for chunk in chunks])
+    sources = build_sources(chunks)
+    yield "sources", {"sources": sources}
+    
+    messages = build_messages(question, build_context(chunks, summary), system_prompt.text)
+    answer_text = ""
+    citations = []
+    scanned = 0
+    async for delta in stream_chat_completion(
+        messages, model=CHAT_MODEL, temperature=0.3, max_tokens=1000, prompt_version=system_prompt.version
+    ):
+        answer_text += delta
+        yield "token", {"text": delta}
+        
+        # A marker can span several deltas; only scan past the last complete one
+        for match in CITATION_PATTERN.finditer(answer_text, scanned):
+            citation = citation_from_match(match, chunks, locators)
+            citations.append(citation)
+            scanned = match.end()
+            yield "citation", citation
+    
+    if cache_key is not None:
+        answer_cache.set(cache_key, {"answer": answer_text, "citations": citations, "sources": sources})
+    yield "done", {"answer": answer_text, "citations": citations, "cached": False}
+
+
+async def query_rag_batch(
+    questions: List[str],
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]],
+    db: AsyncSession,
+    bypass_cache: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    query_rag for several questions about the same scope. The corpus
+    fingerprint, summary and quote locators are loaded once, questions are
+    embedded in one request and retrieved in one vectorized pass, and
+    completions run concurrently up to CHAT_BATCH_MAX_CONCURRENCY.
+    """
+    if not event_id and not ticker_list:
+        return [{"answer": NO_SCOPE_ANSWER, "citations": [], "sources": [], "cached": False} for _ in questions]
+    
+    system_prompt = get_prompt("chat_system")
+    fingerprint = await corpus_fingerprint(db, event_id, ticker_list) if settings.answer_cache_size > 0 else None
+    keys = [
+        await answer_cache_key(question, event_id, ticker_list, system_prompt, db, fingerprint)
+        for question in questions
+    ]
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+    if not bypass_cache:
+        for i, key in enumerate(keys):
+            cached = answer_cache.get(key) if key is not None else None
+            if cached is not None:
+                results[i] = {**cached, "cached": True}
+    
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+    
+    hit_lists = await search_similar_chunks_batch(
+        [questions[i] for i in pending], event_id, ticker_list, db,
+        limit=5 if event_id else 10
+    )
+    summary = None
+    if event_id:
+        summary = (await db.execute(select(Summary).where(Summary.event_id == event_id))).scalars().first()
+    locators = await get_locators(db, [event_id] + [chunk.event_id for chunks in hit_lists for chunk in chunks])
+    
+    semaphore = asyncio.Semaphore(settings.chat_batch_max_concurrency)
+    
+    async def answer(i: int, chunks: List[ChunkHit]):
+        async with semaphore:
+            answer_text, citations = await generate_grounded_answer(
+                questions[i], build_context(chunks, summary), chunks, system_prompt, locators
+            )
+        result = {
+            "answer": answer_text,
+            "citations": citations,
+            "sources": build_sources(chunks)
+        }
+        if keys[i] is not None and answer_text != ANSWER_ERROR:
+            answer_cache.set(keys[i], result)
+        results[i] = {**result, "cached": False}
+    
+    await asyncio.gather(*(answer(i, chunks) for i, chunks in zip(pending, hit_lists)))
+    return results
+
+
+async def answer_cache_key(
+    question: str,
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]],
+    system_prompt: Prompt,
+    db: AsyncSession,
+    fingerprint: Optional[Tuple] = None
+) -> Optional[Tuple]:
+    if settings.answer_cache_size <= 0:
+        return None
+    return (
+        answer_scope(event_id, ticker_list),
+        normalize_text(question).casefold(),
+        prompt_version(system_prompt),
+        fingerprint if fingerprint is not None else await corpus_fingerprint(db, event_id, ticker_list)
+    )
+
+
+async def retrieve_context(
+    question: str,
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]],
+    db: AsyncSession
+) -> Tuple[List[ChunkHit], Optional[Summary]]:
+    """Relevant chunks, plus the event summary for single-event queries"""
+    if event_id:
+        chunks = await search_similar_chunks(question, event_id, db, limit=5)
+        summary = (await db.execute(select(Summary).where(Summary.event_id == event_id))).scalars().first()
+        return chunks, summary
+    
+    chunks = await search_similar_chunks_across_watchlist(question, ticker_list, db, limit=10)
+    return chunks, None
+
+
+def build_sources(chunks: List[ChunkHit]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "chunk_id": chunk.id,
+            "event_id": chunk.event_id,
+            "text": chunk.text[:200] + "...",
+            "timestamp": chunk.start_time
+        }
+        for chunk in chunks[:3]
+    ]
+
+
+def answer_scope(event_id: Optional[int], ticker_list: Optional[List[str]]) -> Tuple:
+    return ("event", event_id) if event_id else ("tickers", tuple(sorted(set(ticker_list))))
 
 
-def build_context(chunks: List[TranscriptChunk], summary: Optional[Summary]) -> str:
+def prompt_version(system_prompt: Prompt) -> str:
+    """Changes whenever the chat prompt or model changes, so cached answers are not reused across them"""
+    return f"{CHAT_MODEL}@{system_prompt.version}"
+
+
+async def corpus_fingerprint(
+    db: AsyncSession,
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]]
+) -> Tuple:
     """
-    Build context from chunks and summary for LLM
+    Chunk count/max id and summary id/timestamp for the queried scope.
+    Re-chunking or re-summarizing changes the fingerprint, which retires
+    every cached answer for that scope, including ones cached by other workers.
+    Memoized per scope for answer_fingerprint_ttl_seconds; this process's own
+    rewrites drop the memo through invalidate_answers.
     """
-    context_parts = []
+    scope = answer_scope(event_id, ticker_list)
+    fingerprint = fingerprint_cache.get(scope)
+    if fingerprint is None:
+        generation = _invalidations
+        fingerprint = await _load_fingerprint(db, event_id, ticker_list)
+        if generation == _invalidations:
+            fingerprint_cache.set(scope, fingerprint)
+    return fingerprint
+
+
+async def _load_fingerprint(
+    db: AsyncSession,
+    event_id: Optional[int],
+    ticker_list: Optional[List[str]]
+) -> Tuple:
+    if event_id:
+        scope = TranscriptChunk.event_id == event_id
+        summary_scope = Summary.event_id == event_id
+    else:
+        scope = TranscriptChunk.ticker.in_(ticker_list)
+        summary_scope = Summary.event_id.in_(select(Event.id).where(Event.ticker.in_(ticker_list)))
     
-    if summary and summary.quicktake:
-        context_parts.append("=== SUMMARY ===")
-        for item in summary.quicktake:
-            context_parts.append(f"- {item.get('bullet', '')}")
-        context_parts.append("")
+    chunks = select(func.count(TranscriptChunk.id), func.max(TranscriptChunk.id)).where(scope)
+    summaries = select(func.count(Summary.id), func.max(Summary.id), func.max(Summary.generated_at)).where(summary_scope)
+    return tuple((await db.execute(chunks)).one()) + tuple((await db.execute(summaries)).one())
+
+
+def invalidate_answers(event_id: Optional[int] = None, ticker: Optional[str] = None):
+    """
+    Drop cached answers whose scope covers the event: its own scope and any
+    ticker set containing its ticker. Called when chunks or summaries are
+    rewritten in this process; with no event, everything is dropped.
+    """
+    global _invalidations
+    _invalidations += 1
+    if event_id is None:
+        answer_cache.clear()
+        fingerprint_cache.clear()
+        return
     
-    context_parts.append("=== RELEVANT TRANSCRIPT EXCERPTS ===")
-    for chunk in chunks:
-        timestamp = chunk.start_time or "unknown"
-        speaker = chunk.speaker or "Speaker"
-        context_parts.append(f"[{timestamp}] {speaker}: {chunk.text}")
-        context_parts.append("")
+    def covers(scope: Tuple) -> bool:
+        return scope == ("event", event_id) or (scope[0] == "tickers" and ticker in scope[1])
     
-    return "\n".join(context_parts)
+    fingerprint_cache.discard_where(covers)
+    answer_cache.discard_where(lambda key: covers(key[0]))
+
+
+def build_context(chunks: List[ChunkHit], summary: Optional[Summary]) -> str:
+    """
+    Build context from chunks and summary for LLM, merging overlapping
+    chunks and staying within RAG_CONTEXT_MAX_TOKENS
+    """
+    return pack_context(chunks, summary, settings.rag_context_max_tokens)
 
 
 async def generate_grounded_answer(
     question: str,
     context: str,
-    chunks: List[TranscriptChunk]
+    chunks: List[ChunkHit],
+    system_prompt: Optional[Prompt] = None,
+    locators: Optional[Dict[int, QuoteLocator]] = None
 ) -> tuple:
     """
     Generate answer with strict grounding and extract citations
     """
-    try:
-        with open("backend/prompts/chat_system.txt", "r") as f:
-            system_prompt = f.read()
-    except:
-        with open("prompts/chat_system.txt", "r") as f:
-            system_prompt = f.read()
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
-    ]
+    system_prompt = system_prompt or get_prompt("chat_system")
+    messages = build_messages(question, context, system_prompt.text)
     
     try:
-        answer = await get_chat_completion(messages, temperature=0.3, max_tokens=1000)
+        answer = await get_chat_completion(
+            messages, model=CHAT_MODEL, temperature=0.3, max_tokens=1000, prompt_version=system_prompt.version
+        )
         
-        citations = extract_citations(answer, chunks)
+        citations = extract_citations(answer, chunks, locators)
         
         return answer, citations
     except Exception as e:
         logger.error(f"Error generating answer: {e}")
-        return "I encountered an error processing your question. Please try again.", []
+        return ANSWER_ERROR, []
+
+
+def build_messages(question: str, context: str, system_prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
+    ]
 
 
-def extract_citations(answer_text: str, chunks: List[TranscriptChunk]) -> List[Dict[str, Any]]:
+def extract_citations(
+    answer_text: str,
+    chunks: List[ChunkHit],
+    locators: Optional[Dict[int, QuoteLocator]] = None
+) -> List[Dict[str, Any]]:
     """
     Extract citations from answer text
     Format: [quote "...", ts HH:MM:SS]
     """
-    import re
-    
-    citations = []
-    citation_pattern = r'\[quote\s+"([^"]+)",\s*ts\s+(\d{2}:\d{2}:\d{2})\]'
-    
-    matches = re.finditer(citation_pattern, answer_text)
+    return [citation_from_match(match, chunks, locators) for match in CITATION_PATTERN.finditer(answer_text)]
+
+
+def citation_from_match(
+    match: re.Match,
+    chunks: List[ChunkHit],
+    locators: Optional[Dict[int, QuoteLocator]] = None
+) -> Dict[str, Any]:
+    """
+    Resolve a citation marker against the full transcripts of the retrieved
+    events, most relevant event first, so quotes spanning chunk boundaries
+    or outside the retrieved chunks still get offsets and chunk ids.
+    Falls back to matching the retrieved chunks when no transcript contains it.
+    """
+    quote = match.group(1)
+    timestamp = match.group(2)
     
-    for match in matches:
-        quote = match.group(1)
-        timestamp = match.group(2)
-        
-        matching_chunk = next(
-            (chunk for chunk in chunks if timestamp == chunk.start_time or quote[:50] in chunk.text),
-            None
-        )
-        
-        citations.append({
+    for event_id, locator in (locators or {}).items():
+        found = locator.locate(quote)
+        if found is None:
+            continue
+        return {
             "quote": quote,
             "timestamp": timestamp,
-            "chunk_id": matching_chunk.id if matching_chunk else None,
-            "event_id": matching_chunk.transcript.event_id if matching_chunk and matching_chunk.transcript else None
-        })
+            "chunk_id": found.chunk_ids[0] if found.chunk_ids else None,
+            "event_id": event_id,
+            "chunk_ids": found.chunk_ids,
+            "start_char": found.start_char,
+            "end_char": found.end_char,
+            "source_timestamp": found.timestamp,
+            "verified": True
+        }
     
-    return citations
+    matching_chunk = next(
+        (chunk for chunk in chunks if timestamp == chunk.start_time or quote[:50] in chunk.text),
+        None
+    )
+    
+    return {
+        "quote": quote,
+        "timestamp": timestamp,
+        "chunk_id": matching_chunk.id if matching_chunk else None,
+        "event_id": matching_chunk.event_id if matching_chunk else None,
+        "chunk_ids": [matching_chunk.id] if matching_chunk else [],
+        "start_char": None,
+        "end_char": None,
+        "source_timestamp": None,
+        "verified": False
+    }
 
 
-async def suggest_questions(event_id: int, db: Session) -> List[str]:
+async def suggest_questions(event_id: int, db: AsyncSession) -> List[str]:
     """
     Generate suggested questions based on event summary
     """
-    summary = db.query(Summary).filter(Summary.event_id == event_id).first()
+    summary = (await db.execute(select(Summary).where(Summary.event_id == event_id))).scalars().first()
     
     if not summary:
         return [
@@ -0,0 +1,218 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+import asyncio
+import heapq
+import itertools
+import random
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lower lanes are served first whenever callers are waiting
+INTERACTIVE = "interactive"
+INGESTION = "ingestion"
+BACKFILL = "backfill"
+LANES = (INTERACTIVE, INGESTION, BACKFILL)
+
+_lane: ContextVar[str] = ContextVar("llm_priority_lane", default=INGESTION)
+
+
+@contextmanager
+def priority_lane(lane: str):
+    """Run OpenAI calls made inside this block (and tasks it spawns) in lane"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown priority lane: {lane}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+class RateLimiter:
+    """
+    Two token buckets, requests per minute and tokens per minute, refilled
+    continuously. Waiters are granted strictly by lane, then in arrival
+    order, so queued backfill work never delays an interactive request.
+    pause() holds every lane, e.g. for a server's Retry-After.
+    """
+    
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float):
+        self.name = name
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        
+        self.granted = {lane: 0 for lane in LANES}
+        self.wait_seconds = {lane: 0.0 for lane in LANES}
+        self.max_wait_seconds = {lane: 0.0 for lane in LANES}
+        self.rate_limited = 0
+        self.retries = 0
+    
+    async def acquire(self, tokens: int, lane: Optional[str] = None):
+        lane = lane or current_lane()
+        # A request larger than the bucket could never be granted; let it through on a full bucket
+        tokens = min(float(tokens), self.token_capacity)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (LANES.index(lane), next(self._sequence), tokens, future))
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The cancelled future is dropped from the head of the queue on dispatch
+            self._dispatch()
+            raise
+        
+        waited = time.monotonic() - started
+        self.granted[lane] += 1
+        self.wait_seconds[lane] += waited
+        self.max_wait_seconds[lane] = max(self.max_wait_seconds[lane], waited)
+    
+    def pause(self, seconds: float):
+        """Grant nothing for the next seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning(f"{self.name} rate limiter paused for {seconds:.1f}s")
+    
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_capacity / 60.0)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_capacity / 60.0)
+    
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            
+            delay = self._paused_until - now
+            if delay <= 0:
+                # Time until both buckets hold enough for the head of the queue
+                delay = max(
+                    (1.0 - self._requests) * 60.0 / self.request_capacity,
+                    (tokens - self._tokens) * 60.0 / self.token_capacity,
+                    0.0
+                )
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            
+            heapq.heappop(self._waiters)
+            self._requests -= 1.0
+            self._tokens -= tokens
+            future.set_result(None)
+    
+    def stats(self) -> Dict[str, Any]:
+        depth = {lane: 0 for lane in LANES}
+        for lane_index, _, _, future in self._waiters:
+            if not future.done():
+                depth[LANES[lane_index]] += 1
+        return {
+            "queue_depth": depth,
+            "granted": dict(self.granted),
+            "avg_wait_seconds": {
+                lane: self.wait_seconds[lane] / self.granted[lane] if self.granted[lane] else 0.0
+                for lane in LANES
+            },
+            "max_wait_seconds": dict(self.max_wait_seconds),
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "paused_seconds_remaining": max(0.0, self._paused_until - time.monotonic())
+        }
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from retry-after-ms or Retry-After (seconds or HTTP date)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+async def call_with_limits(
+    limiter: RateLimiter,
+    tokens: int,
+    call: Callable[[], Awaitable[Any]],
+    max_retries: int,
+    backoff_base: float,
+    backoff_max: float
+) -> Any:
+    """
+    Run call once limiter grants the request, retrying 429s, timeouts,
+    connection errors and 5xx. A Retry-After pauses the whole limiter for
+    that long; otherwise the retry waits a jittered exponential backoff.
+    Other errors propagate immediately.
+    """
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(tokens)
+        try:
+            return await call()
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_retries:
+                raise
+            
+            if isinstance(e, RateLimitError):
+                limiter.rate_limited += 1
+            limiter.retries += 1
+            delay = retry_after_seconds(e)
+            if delay is not None:
+                limiter.pause(delay)
+            else:
+                delay = backoff_delay(attempt, backoff_base, backoff_max)
+            logger.warning(
+                f"{limiter.name} call failed (attempt {attempt + 1}/{max_retries + 1}), "
+                f"retrying in {delay:.1f}s: {e}"
+            )
+            await asyncio.sleep(delay)
@@ -0,0 +1,87 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from typing import Optional
+from app.config import get_settings
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
+from app.models.models import WatchlistItem
+from app.providers.base import TranscriptProvider
+from app.services.ingestion_service import ingest_transcript
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_scheduler: Optional[AsyncIOScheduler] = None
+_poll_lock = asyncio.Lock()
+
+
+def get_provider() -> TranscriptProvider:
+    """Transcript provider selected by TRANSCRIPT_PROVIDER"""
+    if settings.transcript_provider == "mock":
+        from app.providers.mock import MockProvider
+        return MockProvider()
+    if settings.transcript_provider == "finnhub":
+        from app.providers.finnhub import FinnhubProvider
+        return FinnhubProvider()
+    raise ValueError(f"Unknown transcript provider: {settings.transcript_provider}")
+
+
+async def poll_providers():
+    """
+    Check the provider for new transcripts of every watchlisted ticker and
+    ingest them. A poll that is still running makes the next one a no-op.
+    """
+    if _poll_lock.locked():
+        logger.warning("Previous provider poll still running, skipping this one")
+        return
+    
+    async with _poll_lock:
+        if AsyncSessionLocal is None:
+            logger.warning("Database not available, skipping provider poll")
+            return
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                tickers = (await db.execute(select(WatchlistItem.ticker).distinct())).scalars().all()
+                if not tickers:
+                    return
+                
+                new_transcripts = await get_provider().check_new_transcripts(tickers)
+                for data in new_transcripts:
+                    try:
+                        await ingest_transcript(data, db)
+                    except Exception as e:
+                        await db.rollback()
+                        logger.error(f"Error ingesting {data.provider_event_id}: {e}")
+            except Exception as e:
+                logger.error(f"Provider poll failed: {e}")
+
+
+def start_scheduler() -> AsyncIOScheduler:
+    """Start polling on the running event loop"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = AsyncIOScheduler()
+        _scheduler.add_job(
+            poll_providers,
+            "interval",
+            seconds=settings.poll_interval_seconds,
+            jitter=settings.poll_jitter_seconds,
+            max_instances=1,
+            coalesce=True,
+            id="poll_providers"
+        )
+        _scheduler.start()
+        logger.info(
+            f"Polling {settings.transcript_provider} every {settings.poll_interval_seconds}s "
+            f"(jitter {settings.poll_jitter_seconds}s)"
+        )
+    return _scheduler
+
+
+def shutdown_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
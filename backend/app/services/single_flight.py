@@ -0,0 +1,57 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_flights: List["SingleFlight"] = []
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts
+    the work as a task and later callers await that same task. The task is
+    shielded, so a caller that gives up does not cancel it for the others.
+    Nothing is kept after it finishes; repeat calls are the caches' job.
+    
+    The work runs in the first caller's context, including its rate-limiter
+    lane, and keeps that lane: an interactive caller that joins work started
+    in the backfill lane waits at backfill priority. Interactive chat rarely
+    shares a key with ingestion or backfill work, so this is accepted
+    rather than re-queueing the shared call in the joiner's lane.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+        _flights.append(self)
+    
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.started += 1
+        else:
+            self.joined += 1
+            logger.debug(f"Joined in-flight {self.name} call")
+        return await asyncio.shield(task)
+    
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._inflight), "started": self.started, "joined": self.joined}
+
+
+def flight_stats() -> Dict[str, Dict[str, Any]]:
+    return {flight.name: flight.stats() for flight in _flights}
@@ -1,20 +1,48 @@
-from typing import Dict, Any, List
-from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
 from app.models.models import Event, Summary
-from app.services.openai_service import get_chat_completion
+from app.services.openai_service import get_chat_completion, get_encoding
+from app.services.completion_cache import CompletionCacheMiss
+from app.services.transcript_parser import ensure_structured, render_transcript
+from app.services.quote_locator import QuoteLocator, get_locators, verify_quotes, WORD
+from app.services.prompt_registry import get_prompt
+import asyncio
 import json
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
-async def generate_summary(event_id: int, transcript_text: str, db: Session) -> Summary:
+async def generate_summary(
+    event_id: int,
+    transcript_text: str,
+    db: AsyncSession,
+    structured: Optional[Dict[str, Any]] = None
+) -> Summary:
     """
-    Generate multi-pass summary: extractive -> abstractive
+    Generate multi-pass summary: extractive -> abstractive.
+    SUMMARY_MODE "map_reduce" extracts quotes from every token-bounded
+    section of the transcript in parallel and merges them; "single" uses
+    only the first section. Extracted quotes are checked against the raw
+    transcript before the abstractive pass.
     """
     logger.info(f"Generating summary for event {event_id}")
     
-    extractive_quotes = await extractive_pass(transcript_text)
+    structured = ensure_structured(transcript_text, structured)
+    sections = split_sections(render_transcript(transcript_text, structured), settings.summary_section_max_tokens)
+    if settings.summary_mode == "single":
+        if len(sections) > 1:
+            logger.warning(f"Summarizing only the first of {len(sections)} sections for event {event_id}")
+        extractive_quotes = await extractive_pass(sections[0])
+    elif settings.summary_mode == "map_reduce":
+        extractive_quotes = await map_extractive(sections)
+    else:
+        raise ValueError(f"Unknown summary mode: {settings.summary_mode}")
+    # The per-transcript locator cached for citations; built from the text alone if the event has no row
+    locator = (await get_locators(db, [event_id])).get(event_id) or QuoteLocator(transcript_text)
+    extractive_quotes = verify_quotes(extractive_quotes, locator)
     
     abstractive_result = await abstractive_pass(extractive_quotes)
     
@@ -27,33 +55,115 @@ async def generate_summary(event_id: int, transcript_text: str, db: Session) ->
     )
     
     db.add(summary)
-    db.commit()
-    db.refresh(summary)
+    await db.commit()
+    await db.refresh(summary)
     
     logger.info(f"Summary generated for event {event_id}")
     return summary
 
 
-async def extractive_pass(transcript_text: str) -> List[Dict[str, Any]]:
+def split_sections(rendered: str, max_tokens: int) -> List[str]:
     """
-    First pass: Extract verbatim quotes with timestamps
+    Split a rendered transcript into sections of at most max_tokens,
+    breaking between utterance lines. A single utterance longer than
+    max_tokens is split at token boundaries.
     """
-    try:
-        with open("backend/prompts/extractive.txt", "r") as f:
-            system_prompt = f.read()
-    except:
-        with open("prompts/extractive.txt", "r") as f:
-            system_prompt = f.read()
+    encoding = get_encoding()
+    sections = []
+    lines: List[str] = []
+    used = 0
+    for line in rendered.split("\n"):
+        tokens = encoding.encode(line)
+        if lines and used + len(tokens) + 1 > max_tokens:
+            sections.append("\n".join(lines))
+            lines, used = [], 0
+        while len(tokens) > max_tokens:
+            sections.append(encoding.decode(tokens[:max_tokens]))
+            tokens = tokens[max_tokens:]
+            line = encoding.decode(tokens)
+        lines.append(line)
+        used += len(tokens) + 1
+    if lines:
+        sections.append("\n".join(lines))
+    return sections or [""]
+
+
+async def map_extractive(sections: List[str]) -> List[Dict[str, Any]]:
+    """
+    Map: extractive pass over every section, at most SUMMARY_MAX_CONCURRENCY
+    at a time, so wall time stays near one call. Reduce: merge_quotes.
+    """
+    semaphore = asyncio.Semaphore(settings.summary_max_concurrency)
     
+    async def extract(section: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await extractive_pass(section)
+    
+    quote_lists = await asyncio.gather(*(extract(section) for section in sections))
+    quotes = merge_quotes(quote_lists, settings.summary_max_quotes)
+    logger.info(f"Merged {sum(len(found) for found in quote_lists)} quotes from {len(sections)} sections into {len(quotes)}")
+    return quotes
+
+
+def merge_quotes(quote_lists: List[List[Dict[str, Any]]], max_quotes: int) -> List[Dict[str, Any]]:
+    """
+    Drop quotes whose words repeat or are contained in another quote
+    (keeping the longer one), then take quotes from each section in turn up
+    to max_quotes so late sections such as Q&A are represented. The result
+    is in section order.
+    """
+    kept: List[tuple] = []
+    for section, quotes in enumerate(quote_lists):
+        for position, quote in enumerate(quotes):
+            if not isinstance(quote, dict):
+                continue
+            words = " ".join(word.casefold() for word in WORD.findall(str(quote.get("quote", ""))))
+            if not words:
+                continue
+            duplicate = next((i for i, other in enumerate(kept) if words in other[2] or other[2] in words), None)
+            if duplicate is None:
+                kept.append((section, position, words, quote))
+            elif len(words) > len(kept[duplicate][2]):
+                kept[duplicate] = (kept[duplicate][0], kept[duplicate][1], words, quote)
+    
+    by_section: Dict[int, List[tuple]] = {}
+    for entry in kept:
+        by_section.setdefault(entry[0], []).append(entry)
+    
+    selected = []
+    round_index = 0
+    while len(selected) < max_quotes:
+        candidates = [entries[round_index] for entries in by_section.values() if round_index < len(entries)]
+        if not candidates:
+            break
+        remaining = max_quotes - len(selected)
+        if len(candidates) > remaining:
+            # Last partial round: spread the picks across the whole call
+            candidates = [candidates[i * len(candidates) // remaining] for i in range(remaining)]
+        selected.extend(candidates)
+        round_index += 1
+    
+    selected.sort(key=lambda entry: (entry[0], entry[1]))
+    return [entry[3] for entry in selected]
+
+
+async def extractive_pass(transcript_text: str) -> List[Dict[str, Any]]:
+    """
+    First pass: Extract verbatim quotes with timestamps from one section
+    """
+    prompt = get_prompt("extractive")
     messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Extract key quotes from this transcript:\n\n{transcript_text[:15000]}"}
+        {"role": "system", "content": prompt.text},
+        {"role": "user", "content": f"Extract key quotes from this transcript:\n\n{transcript_text}"}
     ]
     
     try:
-        response = await get_chat_completion(messages, temperature=0.3, max_tokens=3000)
+        response = await get_chat_completion(messages, temperature=0.3, max_tokens=3000, prompt_version=prompt.version)
         quotes = json.loads(response)
         return quotes if isinstance(quotes, list) else []
+    except CompletionCacheMiss:
+        # In replay mode a miss must fail the stage, not persist an empty summary
+        raise
     except Exception as e:
         logger.error(f"Error in extractive pass: {e}")
         return []
@@ -63,24 +173,20 @@ async def abstractive_pass(extractive_quotes: List[Dict[str, Any]]) -> Dict[str,
     """
     Second pass: Create QuickTake, guidance table, delta analysis
     """
-    try:
-        with open("backend/prompts/abstractive.txt", "r") as f:
-            system_prompt = f.read()
-    except:
-        with open("prompts/abstractive.txt", "r") as f:
-            system_prompt = f.read()
-    
+    prompt = get_prompt("abstractive")
     quotes_text = json.dumps(extractive_quotes, indent=2)
     
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": prompt.text},
         {"role": "user", "content": f"Create summary based on these quotes:\n\n{quotes_text}"}
     ]
     
     try:
-        response = await get_chat_completion(messages, temperature=0.4, max_tokens=3000)
+        response = await get_chat_completion(messages, temperature=0.4, max_tokens=3000, prompt_version=prompt.version)
         result = json.loads(response)
         return result
+    except CompletionCacheMiss:
+        raise
     except Exception as e:
         logger.error(f"Error in abstractive pass: {e}")
         return {
@@ -0,0 +1,124 @@
+from typing import Any, Dict, List, Optional
+import re
+
+STRUCTURE_VERSION = 1
+
+# "[00:01:15] John Smith, CEO: ...", "Tim Cook (CEO): ...", "Operator: ..."
+UTTERANCE_HEADER = re.compile(
+    r"^[ \t]*(?:\[(?P<timestamp>\d{2}:\d{2}:\d{2})\][ \t]*)?"
+    r"(?P<speaker>[A-Z][A-Za-z.'\-]*(?:[ \t]+[A-Z][A-Za-z.'\-]*){0,4})"
+    r"(?:[ \t]*\((?P<paren>[^()\n:]{1,60})\)|,[ \t]*(?P<affiliation>[A-Z][A-Za-z&.'\- ]{0,60}?))?"
+    r"[ \t]*:[ \t]*",
+    re.MULTILINE
+)
+
+MANAGEMENT_TITLE = re.compile(
+    r"\b(?:CEO|CFO|COO|CTO|CIO|CMO|President|Chair(?:man|woman)?|Chief|Officer|"
+    r"Founder|Director|Head|VP|Vice President|Treasurer|Controller|Investor Relations|IR)\b"
+)
+
+QA_MARKER = re.compile(
+    r"Q&A|question[- ]and[- ]answer|questions? and answers?|"
+    r"open (?:up )?the (?:call|line|lines|floor) (?:for|to) questions",
+    re.IGNORECASE
+)
+
+
+def parse_transcript(text: str) -> Dict[str, Any]:
+    """
+    Split raw transcript text into utterances in a single pass.
+    Each utterance records speaker, role, firm, timestamp, section
+    ("prepared" or "qa") and character offsets into the raw text:
+    start (header start), body_start and end.
+    """
+    headers = list(UTTERANCE_HEADER.finditer(text))
+    utterances: List[Dict[str, Any]] = []
+    section = "prepared"
+    qa_start: Optional[int] = None
+    
+    for i, match in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        speaker = match.group("speaker").strip()
+        role, firm = _classify_affiliation(speaker, match.group("paren"), match.group("affiliation"))
+        
+        if section == "prepared" and (QA_MARKER.search(text, match.end(), end) or (firm and not role)):
+            section = "qa"
+            qa_start = len(utterances)
+        
+        utterances.append({
+            "index": len(utterances),
+            "speaker": speaker,
+            "role": role,
+            "firm": firm,
+            "timestamp": match.group("timestamp"),
+            "section": section,
+            "start": match.start(),
+            "body_start": match.end(),
+            "end": end
+        })
+    
+    return {"version": STRUCTURE_VERSION, "utterances": utterances, "qa_start": qa_start}
+
+
+def _classify_affiliation(speaker: str, paren: Optional[str], affiliation: Optional[str]) -> tuple:
+    """Management titles are roles; any other affiliation is the analyst's firm"""
+    if speaker.lower() == "operator":
+        return "operator", None
+    
+    label = (paren or affiliation or "").strip()
+    if not label:
+        return None, None
+    if MANAGEMENT_TITLE.search(label):
+        return label, None
+    return None, label
+
+
+def ensure_structured(raw_text: str, structured: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return structured data if it is current, otherwise parse raw_text"""
+    if structured and structured.get("version") == STRUCTURE_VERSION:
+        return structured
+    return parse_transcript(raw_text)
+
+
+def utterance_text(raw_text: str, utterance: Dict[str, Any]) -> str:
+    """Utterance body with whitespace collapsed"""
+    return " ".join(raw_text[utterance["body_start"]:utterance["end"]].split())
+
+
+def is_analyst(utterance: Dict[str, Any]) -> bool:
+    return bool(utterance.get("firm")) and not utterance.get("role")
+
+
+def speaker_label(utterance: Dict[str, Any]) -> str:
+    affiliation = utterance.get("role") if utterance.get("role") != "operator" else None
+    affiliation = affiliation or utterance.get("firm")
+    return f"{utterance['speaker']}, {affiliation}" if affiliation else utterance["speaker"]
+
+
+def utterance_at(structured: Dict[str, Any], char_offset: int) -> Optional[Dict[str, Any]]:
+    """The utterance covering char_offset, or None if it precedes the first header"""
+    utterances = structured["utterances"]
+    low, high = 0, len(utterances)
+    while low < high:
+        middle = (low + high) // 2
+        if utterances[middle]["start"] <= char_offset:
+            low = middle + 1
+        else:
+            high = middle
+    return utterances[low - 1] if low else None
+
+
+def render_transcript(raw_text: str, structured: Dict[str, Any]) -> str:
+    """Compact "[ts] Speaker, Role: text" rendering grouped by section, for LLM input"""
+    if not structured["utterances"]:
+        return raw_text.strip()
+    
+    lines = []
+    section = None
+    for utterance in structured["utterances"]:
+        if utterance["section"] != section:
+            section = utterance["section"]
+            lines.append("=== Q&A ===" if section == "qa" else "=== PREPARED REMARKS ===")
+        timestamp = f"[{utterance['timestamp']}] " if utterance["timestamp"] else ""
+        lines.append(f"{timestamp}{speaker_label(utterance)}: {utterance_text(raw_text, utterance)}")
+    return "\n".join(lines)
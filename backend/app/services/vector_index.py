@@ -0,0 +1,534 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.models.models import Event, TranscriptChunk
+from app.services.quantization import (
+    QUANTIZATION_MODES, quantize_int8, quantize_binary, decode_codes, approximate_distances
+)
+import numpy as np
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ChunkHit:
+    """
+    Retrieved chunk as plain values, no ORM relationships.
+    distance is the L2 distance to the query, None for lexical-only hits.
+    embedding is set only with MMR_ENABLED, when the search already had
+    the vector at hand; MMR fetches the rest.
+    """
+    
+    __slots__ = ("id", "event_id", "chunk_index", "text", "speaker", "start_time", "meta_data", "distance", "embedding")
+    
+    def __init__(
+        self,
+        id: int,
+        event_id: int,
+        chunk_index: int,
+        text: str,
+        speaker: Optional[str],
+        start_time: Optional[str],
+        meta_data: Optional[Dict],
+        distance: Optional[float] = None,
+        embedding: Optional[np.ndarray] = None
+    ):
+        self.id = id
+        self.event_id = event_id
+        self.chunk_index = chunk_index
+        self.text = text
+        self.speaker = speaker
+        self.start_time = start_time
+        self.meta_data = meta_data
+        self.distance = distance
+        self.embedding = embedding
+
+
+# Everything a prompt or citation needs, selected without the embedding columns
+HIT_COLUMNS = (
+    TranscriptChunk.id,
+    TranscriptChunk.event_id,
+    TranscriptChunk.chunk_index,
+    TranscriptChunk.text,
+    TranscriptChunk.speaker,
+    TranscriptChunk.start_time,
+    TranscriptChunk.meta_data
+)
+
+
+async def fetch_hits(
+    db: AsyncSession,
+    chunk_ids: Sequence[int],
+    distances: Optional[Sequence[Optional[float]]] = None,
+    embeddings: Optional[Sequence[np.ndarray]] = None
+) -> List[ChunkHit]:
+    """ChunkHits for chunk_ids in one projected query, in the given order"""
+    return (await fetch_hit_lists(db, [chunk_ids], [distances], [embeddings]))[0]
+
+
+async def fetch_hit_lists(
+    db: AsyncSession,
+    id_lists: Sequence[Sequence[int]],
+    distance_lists: Sequence[Optional[Sequence[Optional[float]]]],
+    embedding_lists: Optional[Sequence[Optional[Sequence[np.ndarray]]]] = None
+) -> List[List[ChunkHit]]:
+    """fetch_hits for several rankings with a single query for all their ids"""
+    unique_ids = list({chunk_id for chunk_ids in id_lists for chunk_id in chunk_ids})
+    by_id = {}
+    if unique_ids:
+        rows = (await db.execute(select(*HIT_COLUMNS).where(TranscriptChunk.id.in_(unique_ids)))).all()
+        by_id = {row[0]: row for row in rows}
+    
+    if embedding_lists is None:
+        embedding_lists = [None] * len(id_lists)
+    hit_lists = []
+    for chunk_ids, distances, embeddings in zip(id_lists, distance_lists, embedding_lists):
+        distances = distances if distances is not None else [None] * len(chunk_ids)
+        embeddings = embeddings if embeddings is not None else [None] * len(chunk_ids)
+        hit_lists.append([
+            ChunkHit(*by_id[chunk_id], distance=distance, embedding=embedding)
+            for chunk_id, distance, embedding in zip(chunk_ids, distances, embeddings) if chunk_id in by_id
+        ])
+    return hit_lists
+
+
+async def fetch_embeddings(db: AsyncSession, chunk_ids: Sequence[int]) -> np.ndarray:
+    """float32 embedding matrix for chunk_ids in the given order; zero rows for chunks without one"""
+    rows = (await db.execute(
+        select(TranscriptChunk.id, TranscriptChunk.embedding)
+        .where(TranscriptChunk.id.in_(list(chunk_ids)), TranscriptChunk.embedding.isnot(None))
+    )).all()
+    by_id = {row[0]: row[1] for row in rows}
+    vectors = np.zeros((len(chunk_ids), settings.pgvector_dim), dtype=np.float32)
+    for i, chunk_id in enumerate(chunk_ids):
+        if chunk_id in by_id:
+            vectors[i] = np.asarray(by_id[chunk_id], dtype=np.float32)
+    return vectors
+
+
+def mmr_columns() -> Tuple:
+    """The embedding column, selected alongside hits only when MMR will need it"""
+    return (TranscriptChunk.embedding,) if settings.mmr_enabled else ()
+
+
+class VectorBackend(ABC):
+    """Retrieval backend returning the chunks nearest to a query embedding (L2 distance)"""
+    
+    @abstractmethod
+    async def search_event(
+        self,
+        query_embedding: Sequence[float],
+        event_id: int,
+        db: AsyncSession,
+        limit: int
+    ) -> List[ChunkHit]:
+        pass
+    
+    @abstractmethod
+    async def search_tickers(
+        self,
+        query_embedding: Sequence[float],
+        ticker_list: List[str],
+        db: AsyncSession,
+        limit: int
+    ) -> List[ChunkHit]:
+        pass
+    
+    async def search_event_batch(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        event_id: int,
+        db: AsyncSession,
+        limit: int
+    ) -> List[List[ChunkHit]]:
+        """search_event for each query; backends override this to share work across queries"""
+        return [await self.search_event(query_embedding, event_id, db, limit) for query_embedding in query_embeddings]
+    
+    async def search_tickers_batch(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        ticker_list: List[str],
+        db: AsyncSession,
+        limit: int
+    ) -> List[List[ChunkHit]]:
+        return [await self.search_tickers(query_embedding, ticker_list, db, limit) for query_embedding in query_embeddings]
+    
+    def add_chunks(self, event_id: int, chunk_ids: List[int], embeddings: List[Sequence[float]]):
+        """Called after new chunks are committed"""
+        pass
+    
+    def invalidate_event(self, event_id: int):
+        """Called when an event's chunks are deleted or replaced"""
+        pass
+
+
+class PgvectorBackend(VectorBackend):
+    """
+    Nearest-neighbour search in SQL using pgvector's l2_distance.
+    Watchlist-wide queries first take candidates from the HNSW index on the
+    halfvec copy, then re-rank them against the full-precision vector.
+    """
+    
+    async def search_event(self, query_embedding, event_id, db, limit):
+        # One event has at most a few hundred chunks, so an exact scan is cheap
+        # and avoids a filtered HNSW scan returning fewer than limit rows.
+        distance = TranscriptChunk.embedding.l2_distance(query_embedding)
+        stmt = (
+            select(*HIT_COLUMNS, distance, *mmr_columns())
+            .where(TranscriptChunk.event_id == event_id)
+            .order_by(distance)
+            .limit(limit)
+        )
+        return [ChunkHit(*row) for row in await db.execute(stmt)]
+    
+    def __init__(self):
+        self._iterative_scan_supported: Optional[bool] = None
+    
+    async def search_tickers(self, query_embedding, ticker_list, db, limit):
+        if not settings.pgvector_ann_enabled:
+            return await self._search_tickers_exact(query_embedding, ticker_list, db, limit)
+        
+        await self._configure_hnsw(db)
+        
+        distance = TranscriptChunk.embedding.l2_distance(query_embedding)
+        candidates = (
+            select(TranscriptChunk.id)
+            .where(TranscriptChunk.ticker.in_(ticker_list))
+            .order_by(TranscriptChunk.embedding_half.l2_distance(query_embedding))
+            .limit(limit * settings.pgvector_rerank_factor)
+        )
+        stmt = (
+            select(*HIT_COLUMNS, distance, *mmr_columns())
+            .where(TranscriptChunk.id.in_(candidates.scalar_subquery()))
+            .order_by(distance)
+            .limit(limit)
+        )
+        hits = [ChunkHit(*row) for row in await db.execute(stmt)]
+        if len(hits) < limit:
+            # The ticker filter applies after the graph scan, so a watchlist that
+            # is a small share of the corpus can come back short; scan it exactly
+            hits = await self._search_tickers_exact(query_embedding, ticker_list, db, limit)
+        return hits
+    
+    async def _search_tickers_exact(self, query_embedding, ticker_list, db, limit) -> List[ChunkHit]:
+        distance = TranscriptChunk.embedding.l2_distance(query_embedding)
+        stmt = (
+            select(*HIT_COLUMNS, distance, *mmr_columns())
+            .where(TranscriptChunk.ticker.in_(ticker_list))
+            .order_by(distance)
+            .limit(limit)
+        )
+        return [ChunkHit(*row) for row in await db.execute(stmt)]
+    
+    async def _configure_hnsw(self, db: AsyncSession):
+        """SET LOCAL scopes the search parameters to the current transaction"""
+        await db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.pgvector_hnsw_ef_search)}"))
+        if settings.pgvector_iterative_scan in ("relaxed_order", "strict_order") and await self._supports_iterative_scan(db):
+            await db.execute(text(f"SET LOCAL hnsw.iterative_scan = {settings.pgvector_iterative_scan}"))
+    
+    async def _supports_iterative_scan(self, db: AsyncSession) -> bool:
+        """hnsw.iterative_scan exists from pgvector 0.8; setting it on older versions aborts the transaction"""
+        if self._iterative_scan_supported is None:
+            version = (await db.execute(
+                text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            )).scalar()
+            try:
+                self._iterative_scan_supported = tuple(int(part) for part in version.split(".")[:2]) >= (0, 8)
+            except (AttributeError, ValueError):
+                self._iterative_scan_supported = False
+            if not self._iterative_scan_supported:
+                logger.info(f"pgvector {version} has no iterative scan; short filtered HNSW results fall back to an exact scan")
+        return self._iterative_scan_supported
+
+
+class _EventShard:
+    """
+    Contiguous matrix of one event's chunk embeddings: float32 vectors, or
+    int8 / packed binary codes when quantization is enabled.
+    """
+    
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, mode: str, scales: Optional[np.ndarray] = None):
+        self.mode = mode
+        self.size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, vectors.shape[1]), dtype=vectors.dtype)
+        self.aux = np.zeros(0, dtype=np.float32)
+        self._append_encoded(ids, vectors, scales)
+        self.loaded_at = time.monotonic()
+    
+    def append(self, ids: np.ndarray, embeddings: np.ndarray):
+        if self.mode == "int8":
+            codes, scales = quantize_int8(embeddings)
+            self._append_encoded(ids, codes, scales)
+        elif self.mode == "binary":
+            self._append_encoded(ids, quantize_binary(embeddings))
+        else:
+            self._append_encoded(ids, embeddings.astype(np.float32))
+    
+    def _append_encoded(self, ids: np.ndarray, vectors: np.ndarray, scales: Optional[np.ndarray] = None):
+        new_size = self.size + len(ids)
+        if new_size > len(self.ids):
+            capacity = max(new_size, 2 * len(self.ids), 16)
+            self.ids = np.resize(self.ids, capacity)
+            grown = np.zeros((capacity, self.vectors.shape[1]), dtype=self.vectors.dtype)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+            self.aux = np.resize(self.aux, capacity)
+        
+        self.ids[self.size:new_size] = ids
+        self.vectors[self.size:new_size] = vectors
+        if self.mode == "int8":
+            self.aux[self.size:new_size] = scales
+        elif self.mode == "none":
+            self.aux[self.size:new_size] = np.einsum("ij,ij->i", vectors, vectors)
+        self.size = new_size
+    
+    def search(self, query: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Top-limit ids with scores, lower is closer (exact L2 unless quantized),
+        and their row positions in the shard
+        """
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        
+        if self.mode == "none":
+            # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2
+            scores = self.aux[:self.size] - 2.0 * (self.vectors[:self.size] @ query) + float(query @ query)
+        else:
+            scores = approximate_distances(query, self.vectors[:self.size], self.aux[:self.size], self.mode)
+        
+        k = min(limit, self.size)
+        top = np.argpartition(scores, k - 1)[:k]
+        top = top[np.argsort(scores[top])]
+        if self.mode == "none":
+            return self.ids[top], np.sqrt(np.maximum(scores[top], 0.0)), top
+        return self.ids[top], scores[top], top
+    
+    def search_batch(self, queries: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        search for every row of queries with one matrix product: ids and exact
+        L2 distances of shape (len(queries), k), and the row positions.
+        Float shards only.
+        """
+        if self.size == 0:
+            empty = np.empty((len(queries), 0), dtype=np.int64)
+            return empty, np.empty((len(queries), 0), dtype=np.float32), empty
+        
+        scores = (
+            self.aux[:self.size][None, :]
+            - 2.0 * (queries @ self.vectors[:self.size].T)
+            + np.einsum("ij,ij->i", queries, queries)[:, None]
+        )
+        k = min(limit, self.size)
+        top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return self.ids[top], np.sqrt(np.maximum(np.take_along_axis(top_scores, order, axis=1), 0.0)), top
+
+
+class InMemoryBackend(VectorBackend):
+    """
+    Brute-force vectorized search over per-event embedding matrices held in
+    process memory. Shards are loaded on first query and kept current by
+    add_chunks; a TTL reload picks up chunks written by other processes.
+    With quantization enabled, shards hold only compact codes and the
+    candidates they return are re-scored exactly against the stored vectors.
+    """
+    
+    def __init__(self, ttl_seconds: int, quantization: str = "none"):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        self.ttl_seconds = ttl_seconds
+        self.quantization = quantization
+        self._shards: Dict[int, _EventShard] = {}
+        self._lock = threading.Lock()
+    
+    async def _load_shard(self, event_id: int, db: AsyncSession) -> _EventShard:
+        if self.quantization != "none":
+            return await self._load_quantized_shard(event_id, db)
+        
+        rows = (await db.execute(
+            select(TranscriptChunk.id, TranscriptChunk.embedding)
+            .where(TranscriptChunk.event_id == event_id, TranscriptChunk.embedding.isnot(None))
+        )).all()
+        
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        if rows:
+            vectors = np.array([np.asarray(row[1], dtype=np.float32) for row in rows])
+        else:
+            vectors = np.zeros((0, settings.pgvector_dim), dtype=np.float32)
+        
+        logger.info(f"Loaded {len(ids)} chunk embeddings for event {event_id} into vector index")
+        return _EventShard(ids, vectors, "none")
+    
+    async def _load_quantized_shard(self, event_id: int, db: AsyncSession) -> _EventShard:
+        rows = (await db.execute(
+            select(TranscriptChunk.id, TranscriptChunk.embedding_code, TranscriptChunk.embedding_scale)
+            .where(TranscriptChunk.event_id == event_id, TranscriptChunk.embedding.isnot(None))
+        )).all()
+        
+        coded = [row for row in rows if row[1] is not None]
+        width = settings.pgvector_dim if self.quantization == "int8" else settings.pgvector_dim // 8
+        dtype = np.int8 if self.quantization == "int8" else np.uint8
+        codes = decode_codes([row[1] for row in coded], self.quantization) if coded else np.zeros((0, width), dtype=dtype)
+        shard = _EventShard(
+            np.array([row[0] for row in coded], dtype=np.int64),
+            codes,
+            self.quantization,
+            np.array([row[2] or 0.0 for row in coded], dtype=np.float32)
+        )
+        
+        # Chunks stored before quantization was enabled have no codes yet
+        uncoded = [row[0] for row in rows if row[1] is None]
+        if uncoded:
+            legacy = (await db.execute(
+                select(TranscriptChunk.id, TranscriptChunk.embedding).where(TranscriptChunk.id.in_(uncoded))
+            )).all()
+            shard.append(
+                np.array([row[0] for row in legacy], dtype=np.int64),
+                np.array([np.asarray(row[1], dtype=np.float32) for row in legacy])
+            )
+        
+        logger.info(f"Loaded {shard.size} {self.quantization} codes for event {event_id} into vector index")
+        return shard
+    
+    async def _get_shard(self, event_id: int, db: AsyncSession) -> _EventShard:
+        with self._lock:
+            shard = self._shards.get(event_id)
+        if shard is None or time.monotonic() - shard.loaded_at > self.ttl_seconds:
+            shard = await self._load_shard(event_id, db)
+            with self._lock:
+                self._shards[event_id] = shard
+        return shard
+    
+    async def _search_events(self, query_embedding, event_ids: List[int], db: AsyncSession, limit: int) -> List[ChunkHit]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        fetch = limit if self.quantization == "none" else limit * settings.quantization_rerank_factor
+        
+        all_ids, all_scores, all_vectors = [], [], []
+        for event_id in event_ids:
+            shard = await self._get_shard(event_id, db)
+            ids, scores, positions = shard.search(query, fetch)
+            all_ids.append(ids)
+            all_scores.append(scores)
+            if settings.mmr_enabled and self.quantization == "none":
+                all_vectors.append(shard.vectors[positions])
+        
+        if not all_ids:
+            return []
+        
+        ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores)
+        order = np.argsort(scores, kind="stable")[:fetch]
+        
+        if self.quantization == "none":
+            # The shard rows are the embeddings themselves; hand them to MMR
+            vectors = np.concatenate(all_vectors)[order] if all_vectors else None
+            return await fetch_hits(db, ids[order].tolist(), scores[order].tolist(), vectors)
+        
+        # Re-score the candidates exactly; only their embeddings are loaded
+        rows = (await db.execute(
+            select(TranscriptChunk.id, TranscriptChunk.embedding).where(TranscriptChunk.id.in_(ids[order].tolist()))
+        )).all()
+        if not rows:
+            return []
+        vectors = np.array([np.asarray(row[1], dtype=np.float32) for row in rows])
+        distances = np.linalg.norm(vectors - query, axis=1)
+        best = np.argsort(distances)[:limit]
+        return await fetch_hits(
+            db, [rows[i][0] for i in best], distances[best].tolist(), vectors[best] if settings.mmr_enabled else None
+        )
+    
+    async def _search_events_batch(self, query_embeddings, event_ids: List[int], db: AsyncSession, limit: int) -> List[List[ChunkHit]]:
+        """All queries against each shard at once, then one hit lookup for every query's results"""
+        if self.quantization != "none":
+            return [await self._search_events(query_embedding, event_ids, db, limit) for query_embedding in query_embeddings]
+        
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        all_ids, all_distances, all_vectors = [], [], []
+        for event_id in event_ids:
+            shard = await self._get_shard(event_id, db)
+            ids, distances, positions = shard.search_batch(queries, limit)
+            all_ids.append(ids)
+            all_distances.append(distances)
+            if settings.mmr_enabled:
+                all_vectors.append(shard.vectors[positions])
+        
+        if not all_ids:
+            return [[] for _ in query_embeddings]
+        
+        ids = np.concatenate(all_ids, axis=1)
+        distances = np.concatenate(all_distances, axis=1)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :limit]
+        vectors = None
+        if all_vectors:
+            vectors = np.take_along_axis(np.concatenate(all_vectors, axis=1), order[:, :, None], axis=1)
+        return await fetch_hit_lists(
+            db,
+            np.take_along_axis(ids, order, axis=1).tolist(),
+            np.take_along_axis(distances, order, axis=1).tolist(),
+            vectors
+        )
+    
+    async def search_event(self, query_embedding, event_id, db, limit):
+        return await self._search_events(query_embedding, [event_id], db, limit)
+    
+    async def search_tickers(self, query_embedding, ticker_list, db, limit):
+        event_ids = (await db.execute(select(Event.id).where(Event.ticker.in_(ticker_list)))).scalars().all()
+        return await self._search_events(query_embedding, event_ids, db, limit)
+    
+    async def search_event_batch(self, query_embeddings, event_id, db, limit):
+        return await self._search_events_batch(query_embeddings, [event_id], db, limit)
+    
+    async def search_tickers_batch(self, query_embeddings, ticker_list, db, limit):
+        event_ids = (await db.execute(select(Event.id).where(Event.ticker.in_(ticker_list)))).scalars().all()
+        return await self._search_events_batch(query_embeddings, event_ids, db, limit)
+    
+    def add_chunks(self, event_id, chunk_ids, embeddings):
+        if not chunk_ids:
+            return
+        with self._lock:
+            shard = self._shards.get(event_id)
+            if shard is not None:
+                shard.append(
+                    np.asarray(chunk_ids, dtype=np.int64),
+                    np.asarray(embeddings, dtype=np.float32)
+                )
+    
+    def invalidate_event(self, event_id):
+        with self._lock:
+            self._shards.pop(event_id, None)
+
+
+_backend: Optional[VectorBackend] = None
+
+
+def get_vector_backend() -> VectorBackend:
+    """
+    Resolve VECTOR_BACKEND: "pgvector", "memory", or "auto" (pgvector on
+    Postgres with USE_PGVECTOR, in-memory otherwise).
+    """
+    global _backend
+    if _backend is None:
+        name = settings.vector_backend
+        if name == "auto":
+            on_postgres = settings.database_url.startswith("postgresql")
+            name = "pgvector" if settings.use_pgvector and on_postgres else "memory"
+        
+        if name == "pgvector":
+            _backend = PgvectorBackend()
+        elif name == "memory":
+            _backend = InMemoryBackend(
+                ttl_seconds=settings.vector_index_ttl_seconds,
+                quantization=settings.embedding_quantization
+            )
+        else:
+            raise ValueError(f"Unknown vector backend: {settings.vector_backend}")
+        logger.info(f"Using {name} vector backend")
+    return _backend
@@ -0,0 +1,28 @@
+"""
+Standalone ingestion worker: runs the provider polling scheduler outside the
+API process. Use with SCHEDULER_MODE=worker so the API does not poll too.
+
+    python -m app.worker
+"""
+from app.services.scheduler import start_scheduler, shutdown_scheduler
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    start_scheduler()
+    logger.info("ReSeek ingestion worker started")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        shutdown_scheduler()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("ReSeek ingestion worker stopped")
@@ -0,0 +1,124 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import time
+import numpy as np
+from app.database import SessionLocal
+from app.models.models import Transcript, TranscriptChunk
+from app.services.openai_service import get_embeddings_batch, chunk_text
+from app.services.quantization import quantize_int8, quantize_binary, approximate_distances
+
+
+def load_seed_embeddings() -> np.ndarray:
+    """Chunk embeddings from the database, embedding the seeded transcripts if none are stored yet"""
+    db = SessionLocal()
+    try:
+        rows = db.query(TranscriptChunk.embedding).filter(TranscriptChunk.embedding.isnot(None)).all()
+        if rows:
+            return np.array([np.asarray(row[0], dtype=np.float32) for row in rows])
+        
+        # Small windows so the four seeded transcripts give a usable corpus
+        texts = [
+            chunk["text"]
+            for transcript in db.query(Transcript).all()
+            for chunk in chunk_text(transcript.raw_text, max_tokens=60, overlap=10)
+        ]
+    finally:
+        db.close()
+    
+    if not texts:
+        raise SystemExit("No transcripts found. Run scripts/seed_mock_data.py first.")
+    
+    embeddings = asyncio.run(get_embeddings_batch(texts))
+    return np.array([embedding for embedding in embeddings if embedding is not None], dtype=np.float32)
+
+
+def synthetic_embeddings(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors, roughly shaped like transcript embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 20, 1), dim))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, dim))
+    return vectors.astype(np.float32)
+
+
+def recall(approx: np.ndarray, exact: np.ndarray) -> float:
+    return np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)])
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(scores)[:k]
+
+
+def run(vectors: np.ndarray, k: int, rerank_factor: int):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    n, dim = vectors.shape
+    k = min(k, n - 1)
+    fetch = min(k * rerank_factor, n - 1)
+    
+    def exclude_self(scores, i):
+        scores = scores.astype(np.float64)
+        scores[i] = np.inf
+        return scores
+    
+    exact = [top_k(exclude_self(np.linalg.norm(vectors - q, axis=1), i), k) for i, q in enumerate(vectors)]
+    
+    int8_codes, int8_scales = quantize_int8(vectors)
+    binary_codes = quantize_binary(vectors)
+    variants = [
+        ("float32", vectors.nbytes / n, None, None),
+        ("int8", int8_codes.nbytes / n + 4, int8_codes, int8_scales),
+        ("binary", binary_codes.nbytes / n, binary_codes, None),
+    ]
+    
+    print(f"{n} vectors x {dim} dims, recall@{k}, re-rank over top {fetch}\n")
+    print(
+        f"{'mode':<8} {'bytes/vec':>10} {'ratio':>7} {'recall':>8} {'reranked':>9} "
+        f"{'scan us/query':>14} {'vs float32':>11}"
+    )
+    
+    # Exact scores the way the in-memory index computes them: ||x||^2 - 2 x.q + ||q||^2
+    squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+    float_bytes = variants[0][1]
+    float_scan_us = None
+    for mode, bytes_per_vector, codes, scales in variants:
+        first_pass, reranked = [], []
+        scan_seconds = 0.0
+        for i, q in enumerate(vectors):
+            started = time.perf_counter()
+            if codes is None:
+                scores = squared_norms - 2.0 * (vectors @ q) + float(q @ q)
+            else:
+                scores = approximate_distances(q, codes, scales, mode)
+            scan_seconds += time.perf_counter() - started
+            first_pass.append(top_k(exclude_self(scores, i), fetch))
+        scan_us = scan_seconds / n * 1e6
+        float_scan_us = float_scan_us or scan_us
+        
+        for i, candidates in enumerate(first_pass):
+            distances = np.linalg.norm(vectors[candidates] - vectors[i], axis=1)
+            reranked.append(candidates[np.argsort(distances)[:k]])
+        
+        print(
+            f"{mode:<8} {bytes_per_vector:>10.0f} {float_bytes / bytes_per_vector:>6.1f}x "
+            f"{recall([c[:k] for c in first_pass], exact):>8.3f} {recall(reranked, exact):>9.3f} {scan_us:>14.1f} "
+            f"{float_scan_us / scan_us:>10.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/size tradeoff of quantized chunk embeddings")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank-factor", type=int, default=8)
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of seed data")
+    parser.add_argument("--dim", type=int, default=3072)
+    args = parser.parse_args()
+    
+    vectors = synthetic_embeddings(args.synthetic, args.dim) if args.synthetic else load_seed_embeddings()
+    run(vectors, args.k, args.rerank_factor)
+
+
+if __name__ == "__main__":
+    main()
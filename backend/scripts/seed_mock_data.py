@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models.models import Event, Transcript, Summary, QAItem, EventStatus
+from app.services.transcript_parser import parse_transcript
 
 def clear_existing_data(db: Session):
     """Clear existing mock data for the 4 companies"""
@@ -258,7 +259,8 @@ For Q4, we expect net sales between $160 billion and $167 billion, representing
             # Create Transcript
             transcript = Transcript(
                 event_id=event.id,
-                raw_text=company['transcript']
+                raw_text=company['transcript'],
+                structured_data=parse_transcript(company['transcript'])
             )
             db.add(transcript)
             
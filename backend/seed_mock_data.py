@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from app.database import SessionLocal
 from app.models.models import User, Event, Transcript, TranscriptChunk, Summary, QAItem, Watchlist, WatchlistItem
 from app.providers.mock import MockProvider
+from app.services.transcript_parser import parse_transcript
 
 async def seed_database():
     print("=" * 70)
@@ -76,7 +77,8 @@ async def seed_database():
             # Create transcript
             transcript = Transcript(
                 event_id=event.id,
-                raw_text=transcript_data.transcript_text
+                raw_text=transcript_data.transcript_text,
+                structured_data=parse_transcript(transcript_data.transcript_text)
             )
             db.add(transcript)
             db.commit()
@@ -90,6 +92,9 @@ async def seed_database():
             for idx, para in enumerate(paragraphs[:5]):  # Limit to 5 chunks for demo
                 chunk = TranscriptChunk(
                     transcript_id=transcript.id,
+                    event_id=event.id,
+                    ticker=event.ticker,
+                    event_date=event.event_date,
                     chunk_index=idx,
                     text=para,
                     start_time=f"00:{idx*2:02d}:00",
@@ -193,7 +198,7 @@ async def seed_database():
                 db.add(qa_item)
             db.commit()
             print(f"      ✓ Created {len(qa_items_data)} Q&A items")
-            
+        
         print("\n" + "=" * 70)
         print("✅ Database seeding complete!")
         print("=" * 70)
@@ -206,7 +211,7 @@ async def seed_database():
         print(f"  • {len(events_created) * 3} Q&A mappings")
         print(f"\n🚀 Refresh your dashboard to see the data!")
         print("=" * 70)
-        
+    
     except Exception as e:
         print(f"\n❌ Error seeding database: {e}")
         import traceback